@@ -0,0 +1,185 @@
+import os
+import math
+import time
+import asyncio
+import logging
+import threading
+from functools import wraps
+from contextlib import contextmanager, asynccontextmanager
+from flask import jsonify
+from metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+# name: (max concurrent, max queued, typical seconds per call)
+# Each can be overridden with <NAME>_MAX_CONCURRENT / <NAME>_MAX_QUEUE env vars.
+DEFAULT_LIMITS = {
+    "find_website": (16, 64, 5),
+    "get_revenue": (16, 64, 10),
+    "apollo": (8, 32, 5),
+    "growjo": (2, 4, 60),
+    "upload": (int(os.getenv("JOB_WORKERS", 4)), 16, 600),
+    "linkedin": (1, 4, 900),
+}
+
+# How often an async caller checks for a free slot while it waits
+ASYNC_SLOT_POLL_INTERVAL = 0.05
+
+rejections = Counter("leadgen_admission_rejected_total", "Requests rejected with a full queue.", ["name"])
+
+
+class QueueFullError(Exception):
+    """Raised when an endpoint's wait queue is full."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} is at capacity, retry in {retry_after}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Caps concurrent work for one endpoint and bounds how many callers may wait."""
+
+    def __init__(self, name, max_concurrent, max_queue, service_time):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.running = 0
+        self.waiting = 0
+        self._avg_service_time = float(service_time)
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+
+    def retry_after(self):
+        """Seconds until the queue ahead of a new caller should have drained."""
+        with self._lock:
+            ahead = self.waiting + 1
+        return max(1, math.ceil(ahead * self._avg_service_time / self.max_concurrent))
+
+    def admit(self):
+        """Reserve a place in the queue or raise QueueFullError."""
+        with self._lock:
+            if self.running + self.waiting >= self.max_concurrent + self.max_queue:
+                full = True
+            else:
+                full = False
+                self.waiting += 1
+        if full:
+            rejections.inc(self.name)
+            retry_after = self.retry_after()
+            logger.warning(f"Rejecting {self.name} request: queue full, retry after {retry_after}s")
+            raise QueueFullError(self.name, retry_after)
+
+    def withdraw(self):
+        """Give back a queue place that was admitted but will never run."""
+        with self._lock:
+            self.waiting -= 1
+
+    def _enter(self):
+        with self._lock:
+            self.waiting -= 1
+            self.running += 1
+        return time.time()
+
+    def _leave(self, started):
+        elapsed = time.time() - started
+        with self._lock:
+            self.running -= 1
+            # Exponentially weighted so Retry-After follows current conditions
+            self._avg_service_time = 0.8 * self._avg_service_time + 0.2 * elapsed
+        self._slots.release()
+
+    @contextmanager
+    def slot(self):
+        """Wait for a free slot (after admit()) and hold it while the work runs."""
+        self._slots.acquire()
+        started = self._enter()
+        try:
+            yield
+        finally:
+            self._leave(started)
+
+    @asynccontextmanager
+    async def async_slot(self):
+        """slot() for coroutines; waits without blocking the event loop."""
+        try:
+            while not self._slots.acquire(blocking=False):
+                await asyncio.sleep(ASYNC_SLOT_POLL_INTERVAL)
+        except asyncio.CancelledError:
+            self.withdraw()
+            raise
+        started = self._enter()
+        try:
+            yield
+        finally:
+            self._leave(started)
+
+    @contextmanager
+    def run(self):
+        self.admit()
+        with self.slot():
+            yield
+
+    @asynccontextmanager
+    async def async_run(self):
+        self.admit()
+        async with self.async_slot():
+            yield
+
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+
+def get_controller(name):
+    """Return the shared controller for ``name``, creating it from env/defaults."""
+    with _controllers_lock:
+        if name not in _controllers:
+            max_concurrent, max_queue, service_time = DEFAULT_LIMITS.get(name, (4, 16, 30))
+            prefix = name.upper()
+            _controllers[name] = AdmissionController(
+                name,
+                int(os.getenv(f"{prefix}_MAX_CONCURRENT", max_concurrent)),
+                int(os.getenv(f"{prefix}_MAX_QUEUE", max_queue)),
+                service_time,
+            )
+        return _controllers[name]
+
+
+def all_controllers():
+    with _controllers_lock:
+        return dict(_controllers)
+
+
+Gauge(
+    "leadgen_admission_running", "Requests holding an admission slot.", ["name"],
+    collect=lambda: {name: c.running for name, c in all_controllers().items()}
+)
+Gauge(
+    "leadgen_admission_waiting", "Admitted requests waiting for a slot.", ["name"],
+    collect=lambda: {name: c.waiting for name, c in all_controllers().items()}
+)
+
+
+def too_many_requests(error):
+    """429 response for a rejected request, with Retry-After set."""
+    response = jsonify({
+        "error": f"Server is busy with {error.name} requests, please retry later",
+        "retry_after": error.retry_after
+    })
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response, 429
+
+
+def admission_controlled(name):
+    """Limit a Flask view with the named controller, answering 429 when its queue is full."""
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            try:
+                with get_controller(name).run():
+                    return f(*args, **kwargs)
+            except QueueFullError as e:
+                return too_many_requests(e)
+        return decorated
+    return decorator
@@ -1,23 +1,34 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, send_from_directory
 from flask_cors import CORS
 from dotenv import load_dotenv
 import os
-import pandas as pd
+import time
 import asyncio
 import uuid
+import inspect
 import logging
-from scraper.revenueScraper import get_company_revenue_from_growjo
-from scraper.websiteNameScraper import find_company_website
-from scraper.apollo_scraper import enrich_single_company
-from scraper.linkedinScraper.scraping.scraper import scrape_linkedin
-from scraper.linkedinScraper.scraping.login import login_to_linkedin
-from scraper.linkedinScraper.utils.chromeUtils import get_chrome_driver
-from scraper.linkedinScraper.main import run_batches
-from scraper.growjoScraper import GrowjoScraper
-from security import generate_token, token_required, VALID_USERS
+# Scrapers, and the selenium/pandas/bs4 stacks behind them, are imported
+# where they are first used so the API starts quickly
+from security import generate_token, token_required, VALID_USERS, REFRESH_HEADER
+from enrichment import enrich_unique, RecentResults
+from jobs import job_manager
+from scheduler import scheduler, INTERACTIVE, BULK
+from admission import admission_controlled, get_controller, too_many_requests, QueueFullError
+from streaming import requested_stream_format, stream_response
+from ingest import (
+    find_company_column, iter_company_chunks, count_companies, append_results, EmptyUploadError,
+    UPLOAD_CHUNK_SIZE
+)
+from results_store import results_store
+from task_queue import task_queue, TaskFailedError
+from responses import FastJSONProvider, compress_response
+import metrics
+from profiling import profiling_requested, start_request_profile
+from logging_config import configure_logging
 
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 
 # Configure CORS
 CORS(app, resources={
@@ -25,6 +36,7 @@ CORS(app, resources={
         "origins": ["http://localhost:3000"],
         "methods": ["GET", "POST", "OPTIONS"],
         "allow_headers": ["Content-Type", "Authorization"],
+        "expose_headers": [REFRESH_HEADER],
         "supports_credentials": True
     }
 })
@@ -32,30 +44,19 @@ CORS(app, resources={
 # Load environment variables
 load_dotenv()
 
-# Ensure upload directories exist
-os.makedirs('uploads', exist_ok=True)
-os.makedirs('output', exist_ok=True)
-
-# Ensure required directories exist
-os.makedirs('uploads', exist_ok=True)
-os.makedirs('output', exist_ok=True)
-os.makedirs('log', exist_ok=True)
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('log/app.log'),
-        logging.StreamHandler()
-    ]
-)
+# Logging is configured when the server starts, not on import; the uploads
+# and output directories are created by the code that writes to them
 logger = logging.getLogger(__name__)
 
+BATCH_MAX_COMPANIES = int(os.getenv("BATCH_MAX_COMPANIES", 200))
+RESULTS_PAGE_SIZE = 100
+RESULTS_MAX_PAGE_SIZE = int(os.getenv("RESULTS_MAX_PAGE_SIZE", 1000))
+# When set, /api/metrics requires "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
 @app.route('/api/login', methods=['POST', 'OPTIONS'])
 def login():
-    logger.info(f"Incoming request headers: {request.headers}")
-    logger.info(f"Request origin: {request.headers.get('Origin')}")
+    logger.debug(f"Login request from origin: {request.headers.get('Origin')}")
     if request.method == 'OPTIONS':
         response = jsonify({"message": "Preflight check passed"})
         response.headers.add("Access-Control-Allow-Headers", "Content-Type,Authorization")
@@ -99,13 +100,14 @@ def protected_test():
 
 @app.route("/api/find-website", methods=["GET"])
 @token_required
+@admission_controlled("find_website")
 def get_website():
     company = request.args.get("company")
     if not company:
         return jsonify({"error": "Missing company parameter"}), 400
 
-    website = find_company_website(company)
-    print(website)
+    from scraper.websiteNameScraper import find_company_website
+    website = scheduler.run(find_company_website, company, priority=INTERACTIVE)
     if website:
         return jsonify({"company": company, "website": website})
     else:
@@ -113,17 +115,76 @@ def get_website():
 
 @app.route("/api/get-revenue", methods=["GET"])
 @token_required
+@admission_controlled("get_revenue")
 def get_revenue():
     company = request.args.get("company")
     if not company:
         return jsonify({"error": "Missing company parameter"}), 400
 
-    data = get_company_revenue_from_growjo(company)
+    from scraper.revenueScraper import get_company_revenue_from_growjo
+    data = scheduler.run(get_company_revenue_from_growjo, company, priority=INTERACTIVE)
     return jsonify(data)
 
+def read_company_list():
+    """Parse a batch body: either a JSON list of names or {"companies": [...]}."""
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get("companies")
+    if not isinstance(data, list):
+        return None
+    # Drop blanks and duplicates, keep the client's order
+    return list(dict.fromkeys(str(c).strip() for c in data if c and str(c).strip()))
+
+def run_batch(fn, companies):
+    """Run ``fn`` for every company on the bulk lane and return results keyed by company."""
+    futures = {
+        company: scheduler.submit(fn, company, priority=BULK, user=g.current_user)
+        for company in companies
+    }
+    results = {}
+    for company, future in futures.items():
+        try:
+            results[company] = future.result()
+        except Exception as e:
+            logger.error(f"Batch lookup failed for {company}: {e}")
+            results[company] = {"error": str(e)}
+    return results
+
+def lookup_website(company):
+    from scraper.websiteNameScraper import find_company_website
+    website = find_company_website(company)
+    return {"website": website} if website else {"error": "Website not found"}
+
+@app.route("/api/find-website/batch", methods=["POST"])
+@token_required
+@admission_controlled("find_website")
+def get_website_batch():
+    companies = read_company_list()
+    if not companies:
+        return jsonify({"error": "Expected a non-empty list of companies"}), 400
+    if len(companies) > BATCH_MAX_COMPANIES:
+        return jsonify({"error": f"At most {BATCH_MAX_COMPANIES} companies per batch"}), 413
+
+    return jsonify({"results": run_batch(lookup_website, companies)}), 200
+
+@app.route("/api/get-revenue/batch", methods=["POST"])
+@token_required
+@admission_controlled("get_revenue")
+def get_revenue_batch():
+    companies = read_company_list()
+    if not companies:
+        return jsonify({"error": "Expected a non-empty list of companies"}), 400
+    if len(companies) > BATCH_MAX_COMPANIES:
+        return jsonify({"error": f"At most {BATCH_MAX_COMPANIES} companies per batch"}), 413
+
+    from scraper.revenueScraper import get_company_revenue_from_growjo
+    return jsonify({"results": run_batch(get_company_revenue_from_growjo, companies)}), 200
+
 @app.route("/api/apollo-info", methods=["POST"])
 @token_required
+@admission_controlled("apollo")
 def get_apollo_info_batch():
+    from scraper.apollo_scraper import enrich_single_company
     try:
         data = request.get_json()
         if not data:
@@ -146,10 +207,69 @@ def get_apollo_info_batch():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@job_manager.resumable("linkedin")
+def process_linkedin_batch(job, rows, client_id):
+    """Job body for /api/linkedin-info-batch. A resumed job skips its stored rows."""
+    import pandas as pd
+    from scraper.linkedinScraper.main import run_batches
+
+    def on_result(result):
+        # Each row is stored as soon as it is scraped; that is the job's checkpoint
+        if results_store.append(job.id, job.done + job.failed, [result]):
+            job.cancel()
+        job.record(failed="Error" in result)
+
+    def watch_driver(driver):
+        # Quit the batch's browser as soon as the job is cancelled, and stop
+        # watching it once the batch has closed it
+        unregister = job.on_cancel(driver.quit)
+        quit_driver = driver.quit
+
+        def quit():
+            unregister()
+            quit_driver()
+
+        driver.quit = quit
+
+    rows = rows[job.checkpointed:]
+    if task_queue.enabled:
+        # Workers scrape the companies; results still arrive in row order
+        futures = task_queue.map("linkedin", rows, user=job.owner, should_stop=lambda: job.cancelled)
+        for row, future in zip(rows, futures):
+            try:
+                on_result(future.result())
+            except TaskFailedError as e:
+                on_result({"Business Name": row.get("Company"), "Error": str(e)})
+    else:
+        run_batches(
+            pd.DataFrame(rows),
+            client_id=client_id,
+            on_result=on_result,
+            should_stop=lambda: job.cancelled,
+            on_driver=watch_driver
+        )
+
+    # Save whatever was scraped, including a cancelled job's partial rows
+    # and the rows of earlier runs
+    results = list(results_store.iter_rows(job.id))
+    output_filename = None
+    if results:
+        output_filename = f'linkedin_{job.id}.csv'
+        os.makedirs('output', exist_ok=True)
+        pd.DataFrame(results).to_csv(os.path.join('output', output_filename), index=False)
+
+    return {
+        'message': 'LinkedIn scraping cancelled' if job.cancelled else 'LinkedIn scraping finished',
+        'filename': output_filename,
+        'total_processed': len(results),
+        'results_url': f'/api/jobs/{job.id}/results'
+    }
+
 @app.route("/api/linkedin-info-batch", methods=["POST"])
 @token_required
 def get_linkedin_info_batch():
     try:
+        import pandas as pd
         load_dotenv()
         data_list = request.get_json()
 
@@ -164,15 +284,107 @@ def get_linkedin_info_batch():
             return jsonify({"error": "Missing or empty 'Company' column"}), 400
 
         client_id = f"api_{uuid.uuid4().hex[:8]}"
-        results = run_batches(df, client_id=client_id)
+        job = job_manager.submit(
+            "linkedin", process_linkedin_batch, df.to_dict(orient="records"), client_id,
+            owner=g.current_user, total=len(df)
+        )
 
-        return jsonify(results), 200
+        return jsonify({"job_id": job.id, "status_url": f"/api/jobs/{job.id}"}), 202
 
+    except QueueFullError as e:
+        return too_many_requests(e)
     except Exception as e:
         logging.error(f":fire: API Fatal error: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+@token_required
+def get_job(job_id):
+    job = job_manager.get(job_id)
+    if not job or job.owner != g.current_user:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict()), 200
+
+@app.route("/api/jobs/<job_id>/download", methods=["GET"])
+@token_required
+def download_job_output(job_id):
+    job = job_manager.get(job_id)
+    if not job or job.owner != g.current_user:
+        return jsonify({"error": "Job not found"}), 404
+    filename = (job.result or {}).get("filename")
+    if job.status not in ("completed", "cancelled") or not filename \
+            or not os.path.exists(os.path.join('output', filename)):
+        return jsonify({"error": "Job has no output file yet"}), 409
+    return send_from_directory(os.path.abspath('output'), filename, as_attachment=True)
+
+@app.route("/api/jobs/<job_id>/results", methods=["GET"])
+@token_required
+def get_job_results(job_id):
+    """One page of a job's rows, e.g. ?offset=0&limit=100&sort=-company&filter=industry:software"""
+    job = job_manager.get(job_id)
+    if not job or job.owner != g.current_user:
+        return jsonify({"error": "Job not found"}), 404
+
+    try:
+        offset = max(int(request.args.get("offset", 0)), 0)
+        limit = min(max(int(request.args.get("limit", RESULTS_PAGE_SIZE)), 1), RESULTS_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"error": "offset and limit must be integers"}), 400
+
+    filters = {}
+    for spec in request.args.getlist("filter"):
+        column, sep, value = spec.partition(":")
+        if not sep:
+            return jsonify({"error": f"Invalid filter '{spec}', expected column:value"}), 400
+        filters[column] = value
+
+    try:
+        total, rows = results_store.page(
+            job.id, offset=offset, limit=limit, sort=request.args.get("sort"), filters=filters
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify({
+        "job_id": job.id,
+        "status": job.status,
+        "offset": offset,
+        "limit": limit,
+        "total": total,
+        "rows": rows
+    }), 200
+
+@app.route("/api/jobs/<job_id>/cancel", methods=["POST"])
+@token_required
+def cancel_job(job_id):
+    job = job_manager.get(job_id)
+    if not job or job.owner != g.current_user:
+        return jsonify({"error": "Job not found"}), 404
+    if not job_manager.cancel(job_id):
+        return jsonify({"error": f"Job already {job.status}"}), 409
+    return jsonify(job_manager.get(job_id).to_dict()), 202
+
+@app.route("/api/jobs/<job_id>/resume", methods=["POST"])
+@token_required
+def resume_job(job_id):
+    """Restart an interrupted, failed or cancelled job from its last checkpointed row."""
+    job = job_manager.get(job_id)
+    if not job or job.owner != g.current_user:
+        return jsonify({"error": "Job not found"}), 404
+    try:
+        job = job_manager.resume(job_id)
+    except QueueFullError as e:
+        return too_many_requests(e)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify({
+        "job_id": job.id,
+        "status_url": f"/api/jobs/{job.id}",
+        "resumed_from": job.checkpointed
+    }), 202
+
 @app.route("/api/growjo", methods=["POST"])
+@admission_controlled("growjo")
 def scrape():
     data = request.get_json()
     if not data or "company" not in data:
@@ -181,6 +393,7 @@ def scrape():
     company = data["company"]
     headless = data.get("headless", True)
 
+    from scraper.growjoScraper import GrowjoScraper
     scraper = GrowjoScraper(headless=headless)
     try:
         results = scraper.scrape_company(company)
@@ -190,6 +403,41 @@ def scrape():
     finally:
         scraper.close()
 
+@app.route("/api/metrics", methods=["GET"])
+def get_metrics():
+    """Prometheus scrape endpoint."""
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        return jsonify({"error": "Invalid metrics token"}), 401
+    return metrics.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.before_request
+def start_profiling():
+    if profiling_requested(request):
+        g.profiler, g.finish_profile = start_request_profile(request.endpoint or 'unmatched')
+
+@app.after_request
+def attach_profile(response):
+    profiler = g.get('profiler')
+    if profiler:
+        response.headers['X-Profile-File'] = profiler.filename
+        # Streamed responses keep running until the response is closed
+        response.call_on_close(g.finish_profile)
+    return response
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        # The route pattern, not the raw path, so job ids don't each get a series
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.http_latency.observe(time.perf_counter() - started, endpoint, request.method)
+        metrics.http_requests.inc(endpoint, request.method, response.status_code)
+    return response
+
 @app.after_request
 def after_request(response):
     # Don't modify CORS headers for static files
@@ -200,9 +448,111 @@ def after_request(response):
             response.headers['Access-Control-Allow-Credentials'] = 'true'
             response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
             response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
-            response.headers['Vary'] = 'Origin'
+            response.headers['Access-Control-Expose-Headers'] = REFRESH_HEADER
+            response.vary.add('Origin')
     return response
 
+app.after_request(compress_response)
+
+def remove_upload(filepath, *args):
+    if os.path.exists(filepath):
+        os.remove(filepath)
+
+@job_manager.resumable('upload', cleanup=remove_upload)
+def process_upload(job, filepath, column, filename):
+    """Job body for /api/upload: enrich the file chunk by chunk into the processed CSV.
+
+    Every row is stored as soon as it is enriched. A resumed job skips the
+    rows stored by earlier runs and rebuilds the CSV from them first. The
+    upload is kept until the job completes, so a failed, cancelled or
+    interrupted job can be resumed.
+    """
+    output_filename = f'processed_{filename}'
+    output_path = os.path.join('output', output_filename)
+    processed = 0
+    seen = RecentResults()
+    if job.checkpointed:
+        # The CSV may be missing rows that were stored just before a crash
+        remove_upload(output_path)
+        stored = []
+        for row in results_store.iter_rows(job.id):
+            stored.append(row)
+            if len(stored) == UPLOAD_CHUNK_SIZE:
+                append_results(output_path, stored)
+                stored = []
+        if stored:
+            append_results(output_path, stored)
+
+    for companies in iter_company_chunks(filepath, column):
+        if job.cancelled:
+            break
+        skip = min(max(job.checkpointed - processed, 0), len(companies))
+        processed += skip
+        rows = []
+        for company_data in enrich_unique(
+            companies[skip:], seen, user=job.owner, should_stop=lambda: job.cancelled
+        ):
+            if results_store.append(job.id, processed, [company_data]):
+                job.cancel()
+            processed += 1
+            logger.debug(f'Processed {company_data["company"]} ({processed}/{job.total})')
+            job.record(failed='error' in company_data)
+            rows.append(company_data)
+        # Rows finished before a cancel are kept
+        if rows:
+            append_results(output_path, rows)
+
+    if not job.cancelled:
+        os.remove(filepath)
+
+    logger.info(f'Enriched {seen.enriched} unique companies for {processed} rows')
+
+    return {
+        'message': 'File processing cancelled' if job.cancelled else 'File processed successfully',
+        'filename': output_filename,
+        'total_processed': processed,
+        'results_url': f'/api/jobs/{job.id}/results'
+    }
+
+def stream_upload(filepath, column, filename, user):
+    """Yield each enriched row as soon as its lookups finish, then a summary.
+
+    The caller has already been admitted to the 'upload' queue; the slot is
+    held for as long as the stream runs.
+    """
+    output_filename = f'processed_{filename}'
+    output_path = os.path.join('output', output_filename)
+    processed = 0
+    failed = 0
+    seen = RecentResults()
+    try:
+        with get_controller('upload').slot():
+            for companies in iter_company_chunks(filepath, column):
+                rows = []
+                for company_data in enrich_unique(companies, seen, user=user):
+                    logger.debug(f'Processed {company_data["company"]} ({processed + 1})')
+                    if 'error' in company_data:
+                        failed += 1
+                    rows.append(company_data)
+                    yield 'row', {'index': processed, **company_data}
+                    processed += 1
+                append_results(output_path, rows)
+    finally:
+        os.remove(filepath)
+
+    yield 'done', {
+        'message': 'File processed successfully',
+        'filename': output_filename,
+        'total_processed': processed,
+        'failed': failed
+    }
+
+def abandon_stream(events, filepath):
+    """Release the queue place and upload file of a stream that was never started."""
+    if inspect.getgeneratorstate(events) == inspect.GEN_CREATED:
+        get_controller('upload').withdraw()
+        os.remove(filepath)
+
 @app.route('/api/upload', methods=['POST', 'OPTIONS'])
 @token_required
 def upload_file():
@@ -212,7 +562,7 @@ def upload_file():
 
     try:
         # Log request details
-        logger.info(f'Received file upload request. Headers: {dict(request.headers)}')
+        logger.info('Received file upload request')
         
         if 'file' not in request.files:
             logger.error('No file part in request')
@@ -230,91 +580,47 @@ def upload_file():
         # Save the file
         filename = str(uuid.uuid4()) + '.csv'
         filepath = os.path.join('uploads', filename)
+        os.makedirs('uploads', exist_ok=True)
         file.save(filepath)
 
-        # Read and process the CSV file
+        # Validate the CSV without loading it; rows are read in chunks later
         try:
-            df = pd.read_csv(filepath)
-            if df.empty:
-                os.remove(filepath)
-                return jsonify({'error': 'The uploaded file is empty'}), 400
-
-            # Normalize column names
-            df.columns = df.columns.str.strip().str.title()
-            if 'Company' not in df.columns and 'Company Name' in df.columns:
-                df = df.rename(columns={'Company Name': 'Company'})
-
-            required_columns = ['Company']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            if missing_columns:
+            column = find_company_column(filepath)
+            if not column:
                 os.remove(filepath)
                 return jsonify({
-                    'error': f'Missing required columns: {", ".join(missing_columns)}'
+                    'error': 'Missing required columns: Company'
                 }), 400
 
-            # Process the data with enrichment
-            results = []
-            total_rows = len(df)
-            
-            for index, row in df.iterrows():
-                company_name = str(row['Company']).strip()
-                if not company_name:
-                    continue
-
-                company_data = {'company': company_name}
-                logger.info(f'Processing {company_name} ({index + 1}/{total_rows})')
-                
-                try:
-                    # Find company website
-                    website = find_company_website(company_name)
-                    if website:
-                        company_data['website'] = website
-                        logger.info(f'Found website for {company_name}: {website}')
-                        
-                        # Get revenue data from Growjo
-                        revenue_data = get_company_revenue_from_growjo(company_name)
-                        if 'error' not in revenue_data:
-                            company_data.update(revenue_data)
-                            logger.info(f'Found revenue data for {company_name}')
-                        
-                        # Get Apollo data
-                        apollo_data = enrich_single_company(website)
-                        if apollo_data and 'error' not in apollo_data:
-                            company_data.update(apollo_data)
-                            logger.info(f'Found Apollo data for {company_name}')
-                    else:
-                        company_data['error'] = 'Could not find company website'
-                    
-                except Exception as e:
-                    error_msg = str(e)
-                    logger.error(f'Error enriching {company_name}: {error_msg}')
-                    company_data['error'] = error_msg
-                
-                results.append(company_data)
-
-            if not results:
+            total_rows = count_companies(filepath, column)
+            if not total_rows:
                 os.remove(filepath)
                 return jsonify({'error': 'No valid data could be processed'}), 400
 
-            # Save processed results
-            output_filename = f'processed_{filename}'
-            output_path = os.path.join('output', output_filename)
-            
-            # Convert results to DataFrame and save
-            result_df = pd.DataFrame(results)
-            result_df.to_csv(output_path, index=False)
+            stream_format = requested_stream_format()
+            if stream_format:
+                get_controller('upload').admit()
+                events = stream_upload(filepath, column, filename, g.current_user)
+                response = stream_response(events, stream_format)
+                response.call_on_close(lambda: abandon_stream(events, filepath))
+                return response
 
-            # Clean up the original file
-            os.remove(filepath)
+            job = job_manager.submit(
+                'upload', process_upload, filepath, column, filename,
+                owner=g.current_user, total=total_rows
+            )
 
             return jsonify({
-                'message': 'File processed successfully',
-                'filename': output_filename,
-                'total_processed': len(results),
-                'results': results
-            })
+                'message': 'File accepted for processing',
+                'job_id': job.id,
+                'status_url': f'/api/jobs/{job.id}',
+                'total_rows': total_rows
+            }), 202
 
-        except pd.errors.EmptyDataError:
+        except QueueFullError as e:
+            os.remove(filepath)
+            return too_many_requests(e)
+        except EmptyUploadError:
             os.remove(filepath)
             return jsonify({'error': 'The uploaded file is empty'}), 400
         except Exception as e:
@@ -329,4 +635,6 @@ def upload_file():
         return jsonify({'error': f'Upload error: {error_msg}'}), 500
 
 if __name__ == "__main__":
+    # Under a WSGI server, call configure_logging() from its startup hook instead
+    configure_logging()
     app.run(host='0.0.0.0', debug=True, port=5000)
@@ -0,0 +1,259 @@
+"""Async (ASGI) variant of the DataEnhancement API's lookup endpoints.
+
+HTTP-based lookups are awaited directly, so one process can serve many
+concurrent /api/find-website and /api/get-revenue calls. The single-company
+Selenium scrape, /api/growjo, runs on a dedicated, bounded thread pool so it
+never blocks the event loop.
+
+Only login, the lookup endpoints (single and batch), apollo-info, growjo and
+metrics are served here. Uploads (including streaming), LinkedIn batches and
+the /api/jobs endpoints exist only in the Flask app (api.py), which must
+keep serving them alongside this one.
+
+Run with:  uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from fastapi import FastAPI, Depends, Header, HTTPException, Request, Response
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse
+from scraper.revenueScraper import get_company_revenue_from_growjo_async
+from scraper.websiteNameScraper import find_company_website_async
+from scraper.apollo_scraper import enrich_single_company_async
+from security import generate_token, verify_token, refreshed_token, VALID_USERS, REFRESH_HEADER
+from admission import get_controller, QueueFullError
+from scheduler import current_priority, INTERACTIVE
+from responses import orjson, COMPRESS_MIN_SIZE, GZIP_LEVEL
+import metrics
+from logging_config import configure_logging
+
+load_dotenv()
+
+SELENIUM_WORKERS = int(os.getenv("SELENIUM_WORKERS", 2))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 8))
+BATCH_MAX_COMPANIES = int(os.getenv("BATCH_MAX_COMPANIES", 200))
+
+logger = logging.getLogger(__name__)
+
+selenium_executor = ThreadPoolExecutor(max_workers=SELENIUM_WORKERS, thread_name_prefix="selenium")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    configure_logging()
+    yield
+    selenium_executor.shutdown(wait=False, cancel_futures=True)
+
+
+app = FastAPI(
+    title="LeadGen Data Enhancement API (async)",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse if orjson else JSONResponse,
+)
+
+app.add_middleware(GZipMiddleware, minimum_size=COMPRESS_MIN_SIZE, compresslevel=GZIP_LEVEL)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["http://localhost:3000"],
+    allow_methods=["GET", "POST", "OPTIONS"],
+    allow_headers=["Content-Type", "Authorization"],
+    expose_headers=[REFRESH_HEADER],
+    allow_credentials=True,
+)
+
+
+@app.exception_handler(HTTPException)
+async def http_error(request, exc):
+    # Same error shape as the Flask API
+    return JSONResponse({"error": exc.detail}, status_code=exc.status_code)
+
+
+@app.exception_handler(QueueFullError)
+async def queue_full(request, exc):
+    return JSONResponse(
+        {"error": f"Server is busy with {exc.name} requests, please retry later", "retry_after": exc.retry_after},
+        status_code=429,
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
+def current_user(response: Response, authorization: str = Header(None)):
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(401, "Authorization header missing or invalid")
+    decoded = verify_token(authorization.split(" ")[1])
+    if not decoded:
+        raise HTTPException(401, "Invalid or expired token")
+    new_token = refreshed_token(decoded)
+    if new_token:
+        response.headers[REFRESH_HEADER] = new_token
+    return decoded["email"]
+
+
+async def read_json(request):
+    """The request's JSON body; a missing or malformed body is a 400, as in the Flask app."""
+    try:
+        return await request.json()
+    except ValueError:
+        raise HTTPException(400, "Missing request body")
+
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def get_metrics(authorization: str = Header(None)):
+    token = os.getenv("METRICS_TOKEN")
+    if token and authorization != f"Bearer {token}":
+        raise HTTPException(401, "Invalid metrics token")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/api/login")
+async def login(request: Request):
+    data = await read_json(request)
+    email = data.get("email") if isinstance(data, dict) else None
+    password = data.get("password") if isinstance(data, dict) else None
+    if not email or not password:
+        raise HTTPException(400, "Missing credentials")
+    if VALID_USERS.get(email) != password:
+        logger.warning(f"Invalid login attempt for email: {email}")
+        raise HTTPException(401, "Invalid credentials")
+    return {"message": "Login successful", "token": generate_token(email), "email": email}
+
+
+@app.get("/api/protected-test")
+async def protected_test(user: str = Depends(current_user)):
+    return {"message": "This is a protected route"}
+
+
+@app.get("/api/find-website")
+async def get_website(company: str = None, user: str = Depends(current_user)):
+    if not company:
+        raise HTTPException(400, "Missing company parameter")
+
+    # Single lookups skip ahead of batch work in the scrapers' rate limits
+    current_priority.set(INTERACTIVE)
+    async with get_controller("find_website").async_run():
+        website = await find_company_website_async(company)
+    if not website:
+        raise HTTPException(404, "Website not found")
+    return {"company": company, "website": website}
+
+
+@app.get("/api/get-revenue")
+async def get_revenue(company: str = None, user: str = Depends(current_user)):
+    if not company:
+        raise HTTPException(400, "Missing company parameter")
+    current_priority.set(INTERACTIVE)
+    async with get_controller("get_revenue").async_run():
+        return await get_company_revenue_from_growjo_async(company)
+
+
+async def read_company_list(request):
+    data = await read_json(request)
+    if isinstance(data, dict):
+        data = data.get("companies")
+    if not isinstance(data, list):
+        raise HTTPException(400, "Expected a non-empty list of companies")
+    companies = list(dict.fromkeys(str(c).strip() for c in data if c and str(c).strip()))
+    if not companies:
+        raise HTTPException(400, "Expected a non-empty list of companies")
+    if len(companies) > BATCH_MAX_COMPANIES:
+        raise HTTPException(413, f"At most {BATCH_MAX_COMPANIES} companies per batch")
+    return companies
+
+
+async def run_batch(fn, companies):
+    """Await ``fn`` for every company, BATCH_CONCURRENCY at a time, keyed by company."""
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run(company):
+        async with semaphore:
+            try:
+                return await fn(company)
+            except Exception as e:
+                logger.error(f"Batch lookup failed for {company}: {e}")
+                return {"error": str(e)}
+
+    results = await asyncio.gather(*(run(company) for company in companies))
+    return dict(zip(companies, results))
+
+
+async def lookup_website(company):
+    website = await find_company_website_async(company)
+    return {"website": website} if website else {"error": "Website not found"}
+
+
+@app.post("/api/find-website/batch")
+async def get_website_batch(request: Request, user: str = Depends(current_user)):
+    companies = await read_company_list(request)
+    async with get_controller("find_website").async_run():
+        return {"results": await run_batch(lookup_website, companies)}
+
+
+@app.post("/api/get-revenue/batch")
+async def get_revenue_batch(request: Request, user: str = Depends(current_user)):
+    companies = await read_company_list(request)
+    async with get_controller("get_revenue").async_run():
+        return {"results": await run_batch(get_company_revenue_from_growjo_async, companies)}
+
+
+@app.post("/api/apollo-info")
+async def get_apollo_info_batch(request: Request, user: str = Depends(current_user)):
+    data = await read_json(request)
+    if not data:
+        raise HTTPException(400, "Missing request body")
+    if isinstance(data, dict):
+        data = [data]
+
+    async def enrich(company):
+        domain = company.get("domain")
+        if not domain:
+            return {"error": "Missing domain"}
+        return await enrich_single_company_async(domain)
+
+    async with get_controller("apollo").async_run():
+        return await asyncio.gather(*(enrich(company) for company in data))
+
+
+def scrape_growjo(company, headless):
+    # Imported here so selenium is only loaded once a browser is needed
+    from scraper.growjoScraper import GrowjoScraper
+
+    with get_controller("growjo").slot():
+        scraper = GrowjoScraper(headless=headless)
+        try:
+            return scraper.scrape_company(company)
+        finally:
+            scraper.close()
+
+
+@app.post("/api/growjo")
+async def scrape(request: Request):
+    data = await read_json(request)
+    if not data or "company" not in data:
+        raise HTTPException(400, "Missing 'company' in request JSON")
+
+    # Reject before queueing on the executor if too many browsers are pending
+    controller = get_controller("growjo")
+    controller.admit()
+    try:
+        future = selenium_executor.submit(scrape_growjo, data["company"], data.get("headless", True))
+    except RuntimeError as e:
+        # The executor is shutting down
+        controller.withdraw()
+        return JSONResponse({"error": str(e)}, status_code=503)
+    # A call cancelled while still queued (client gone, shutdown) never reaches slot()
+    future.add_done_callback(lambda f: f.cancelled() and controller.withdraw())
+    try:
+        return await asyncio.wrap_future(future)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=5000)
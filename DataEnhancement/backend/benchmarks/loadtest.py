@@ -0,0 +1,322 @@
+"""Load test for the Flask API with the scrapers replaced by stubs.
+
+Starts ``api`` in a child process on a local port. Before the app is imported,
+stub versions of find_company_website, get_company_revenue_from_growjo,
+enrich_single_company and run_batches are installed in place of the real
+scraper modules. Every stub sleeps for a configurable latency and fails at a
+configurable rate, so the numbers show the API's own ceiling (auth, admission,
+scheduler, jobs, serialization) without touching Growjo, Apollo or LinkedIn.
+
+Each scenario keeps ``--concurrency`` clients busy for ``--duration`` seconds
+and reports requests/sec, p50/p99 latency, status codes and the server's
+memory. Job endpoints (upload, linkedin) are timed from submit until the
+polled job has finished. All clients log in as the same user, so the
+per-user scheduler limit (USER_MAX_CONCURRENT) applies to batch requests.
+
+Usage:
+    python benchmarks/loadtest.py [--scenarios find-website,upload] [--concurrency 16]
+        [--duration 10] [--batch-size 20] [--latency 0.2] [--latency apollo=0.5]
+        [--error-rate 0.05] [--error-rate growjo=0.2]
+
+Stub names for --latency/--error-rate: website, growjo, apollo, linkedin.
+"""
+import io
+import os
+import sys
+import json
+import time
+import types
+import logging
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import Counter
+
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUBS = ("website", "growjo", "apollo", "linkedin")
+STUB_CONFIG_ENV = "LOADTEST_STUBS"
+LOGIN = {"email": "admin@leadgen.com", "password": "caprae@123"}
+JOB_DONE = ("completed", "failed", "cancelled")
+
+# name -> (kind, method, path); single requests look up one company,
+# batches and jobs send --batch-size of them
+SCENARIOS = {
+    "find-website": ("single", "GET", "/api/find-website"),
+    "get-revenue": ("single", "GET", "/api/get-revenue"),
+    "apollo-info": ("single", "POST", "/api/apollo-info"),
+    "find-website-batch": ("batch", "POST", "/api/find-website/batch"),
+    "get-revenue-batch": ("batch", "POST", "/api/get-revenue/batch"),
+    "upload": ("job", "POST", "/api/upload"),
+    "linkedin-batch": ("job", "POST", "/api/linkedin-info-batch"),
+}
+
+
+# === Server side (child process) ===
+
+def install_stubs(config):
+    """Put stub scraper modules in sys.modules so the API imports them instead of the real ones."""
+    from metrics import observe_source
+
+    def stub(name):
+        latency = config["latency"][name]
+        error_rate = config["error_rate"][name]
+
+        def call():
+            time.sleep(random.uniform(latency * 0.5, latency * 1.5) if latency else 0)
+            return random.random() >= error_rate
+        return call
+
+    website, growjo, apollo, linkedin = (stub(name) for name in STUBS)
+
+    @observe_source("website_search")
+    def find_company_website(company):
+        return f"https://www.{company.lower().replace(' ', '')}.com" if website() else None
+
+    @observe_source("growjo_http")
+    def get_company_revenue_from_growjo(company):
+        if not growjo():
+            return {"company": company, "error": "Stubbed Growjo failure"}
+        return {"company": company, "estimated_revenue": "$12.5M", "industry": "Software",
+                "location": "Austin, TX", "employees": "85", "website": f"{company.lower()}.com"}
+
+    @observe_source("apollo")
+    def enrich_single_company(url_or_domain):
+        if not apollo():
+            return {"error": "Stubbed Apollo failure"}
+        return {"domain": url_or_domain, "name": url_or_domain.split(".")[0],
+                "industry": "Software", "employee_count": 85}
+
+    def run_batches(df, client_id, on_result=None, should_stop=None, on_driver=None):
+        results = []
+        for company in df.get("Company", []):
+            if should_stop and should_stop():
+                break
+            if linkedin():
+                result = {"Business Name": company, "LinkedIn URL": f"https://linkedin.com/company/{company}",
+                          "Employees": "51-200"}
+            else:
+                result = {"Business Name": company, "Error": "Stubbed LinkedIn failure"}
+            results.append(result)
+            if on_result:
+                on_result(result)
+        return results
+
+    modules = {
+        "scraper.websiteNameScraper": {"find_company_website": find_company_website},
+        "scraper.revenueScraper": {"get_company_revenue_from_growjo": get_company_revenue_from_growjo},
+        "scraper.apollo_scraper": {"enrich_single_company": enrich_single_company},
+        "scraper.linkedinScraper.main": {"run_batches": run_batches},
+    }
+    for name, attributes in modules.items():
+        module = types.ModuleType(name)
+        module.__dict__.update(attributes)
+        sys.modules[name] = module
+
+
+def serve(port):
+    config = json.loads(os.environ[STUB_CONFIG_ENV])
+    sys.path.insert(0, BACKEND_DIR)
+    install_stubs(config)
+
+    from werkzeug.serving import make_server
+    import api
+
+    # One access log line per request would dominate the measurement
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", port, api.app, threaded=True)
+    print("ready", flush=True)
+    server.serve_forever()
+
+
+# === Client side ===
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def memory_usage(pid):
+    """(current, peak) resident memory of ``pid`` in MB, or (None, None) if unavailable."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(fields["VmRSS"].split()[0]) / 1024, int(fields["VmHWM"].split()[0]) / 1024
+    except (OSError, KeyError, ValueError):
+        pass
+    try:
+        import psutil
+        info = psutil.Process(pid).memory_info()
+        return info.rss / 2 ** 20, getattr(info, "peak_wset", info.rss) / 2 ** 20
+    except Exception:
+        return None, None
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class Client:
+    """One simulated user: a keep-alive session that repeats a scenario."""
+
+    def __init__(self, base_url, token, batch_size, poll_interval):
+        self.base_url = base_url
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {token}"
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+
+    def companies(self, count):
+        return [f"Company{random.randrange(10 ** 6)}" for _ in range(count)]
+
+    def request(self, scenario):
+        """Run one scenario request; return its status code (or an exception name)."""
+        kind, method, path = SCENARIOS[scenario]
+        url = self.base_url + path
+        if kind == "single":
+            company = self.companies(1)[0]
+            if method == "GET":
+                response = self.session.get(url, params={"company": company})
+            else:
+                response = self.session.post(url, json=[{"domain": f"{company.lower()}.com"}])
+            return response.status_code
+        if kind == "batch":
+            return self.session.post(url, json={"companies": self.companies(self.batch_size)}).status_code
+
+        companies = self.companies(self.batch_size)
+        if scenario == "upload":
+            csv = "Company\n" + "\n".join(companies) + "\n"
+            response = self.session.post(url, files={"file": ("companies.csv", io.BytesIO(csv.encode()))})
+        else:
+            response = self.session.post(url, json=[{"company": company} for company in companies])
+        if response.status_code != 202:
+            return response.status_code
+        status_url = self.base_url + response.json()["status_url"]
+        while True:
+            job = self.session.get(status_url).json()
+            if job.get("status") in JOB_DONE:
+                return 200 if job["status"] == "completed" else f"job {job['status']}"
+            time.sleep(self.poll_interval)
+
+
+def run_scenario(scenario, base_url, token, args):
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    def worker():
+        client = Client(base_url, token, args.batch_size, args.poll_interval)
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                status = client.request(scenario)
+            except requests.RequestException as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.perf_counter() - started
+
+
+def parse_stub_values(values, option):
+    """Turn ['0.2', 'apollo=0.5'] into {'website': 0.2, ..., 'apollo': 0.5}."""
+    default = 0.0
+    overrides = {}
+    for value in values or []:
+        name, _, number = value.rpartition("=")
+        if name and name not in STUBS:
+            raise SystemExit(f"{option}: unknown stub '{name}', expected one of {', '.join(STUBS)}")
+        if name:
+            overrides[name] = float(number)
+        else:
+            default = float(number)
+    return {name: overrides.get(name, default) for name in STUBS}
+
+
+def start_server(config, workdir):
+    port = free_port()
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR, **{STUB_CONFIG_ENV: json.dumps(config)})
+    env.setdefault("LOG_LEVEL", "ERROR")
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", str(port)],
+        cwd=workdir, env=env, stdout=subprocess.PIPE, text=True
+    )
+    if server.stdout.readline().strip() != "ready":
+        server.kill()
+        raise SystemExit("API server failed to start")
+    return server, f"http://127.0.0.1:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the API with stubbed scrapers")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"comma separated, from: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10, help="seconds per scenario")
+    parser.add_argument("--batch-size", type=int, default=20, help="companies per batch or job")
+    parser.add_argument("--latency", action="append", metavar="[STUB=]SECONDS",
+                        help="mean stub latency, default 0.1")
+    parser.add_argument("--error-rate", action="append", metavar="[STUB=]RATE",
+                        help="share of stub calls that fail, default 0")
+    parser.add_argument("--poll-interval", type=float, default=0.05, help="job status polling interval")
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+    config = {
+        "latency": parse_stub_values(args.latency or ["0.1"], "--latency"),
+        "error_rate": parse_stub_values(args.error_rate, "--error-rate"),
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        server, base_url = start_server(config, workdir)
+        try:
+            token = requests.post(base_url + "/api/login", json=LOGIN).json()["token"]
+            baseline, _ = memory_usage(server.pid)
+            print(f"stubs: latency {config['latency']}, error rate {config['error_rate']}")
+            print(f"{args.concurrency} clients, {args.duration:g}s per scenario, batch size {args.batch_size}")
+            if baseline is not None:
+                print(f"server RSS at start: {baseline:.1f} MB")
+            print()
+            print(f"{'scenario':<20} {'requests':>8} {'req/s':>8} {'p50 ms':>9} {'p99 ms':>9} "
+                  f"{'RSS MB':>8} {'peak MB':>8}  statuses")
+            for scenario in scenarios:
+                latencies, statuses, elapsed = run_scenario(scenario, base_url, token, args)
+                rss, peak = memory_usage(server.pid)
+                memory = f"{rss:>8.1f} {peak:>8.1f}" if rss is not None else f"{'n/a':>8} {'n/a':>8}"
+                print(
+                    f"{scenario:<20} {len(latencies):>8} {len(latencies) / elapsed:>8.1f} "
+                    f"{percentile(latencies, 50) * 1000:>9.1f} {percentile(latencies, 99) * 1000:>9.1f} "
+                    f"{memory}  {', '.join(f'{status}: {count}' for status, count in sorted(statuses.items(), key=str))}"
+                )
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Cold-start benchmark for the Flask API.
+
+Imports ``api`` in fresh interpreters and reports how long it took, which
+heavy libraries were loaded, and which files the import left behind.
+Each run uses an empty working directory.
+
+Usage:  python benchmarks/startup.py [--runs 10] [--module api]
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries that should only load once a scraper is actually used
+HEAVY_MODULES = ["pandas", "selenium", "selenium_stealth", "bs4", "requests", "httpx"]
+
+PROBE = """
+import sys, time, json
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module):
+    """Import ``module`` in a new interpreter; return (seconds, heavy modules loaded, files created)."""
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, PYTHONPATH=BACKEND_DIR)
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=workdir, env=env, capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        created = sorted(
+            os.path.relpath(os.path.join(root, name), workdir)
+            for root, dirs, files in os.walk(workdir)
+            for name in dirs + files
+        )
+    return result["seconds"], result["loaded"], created
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure API import (cold start) time")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--module", default="api")
+    args = parser.parse_args()
+
+    timings = []
+    for _ in range(args.runs):
+        seconds, loaded, created = measure(args.module)
+        timings.append(seconds)
+
+    print(f"import {args.module}: {args.runs} runs")
+    print(f"  min    {min(timings) * 1000:8.1f} ms")
+    print(f"  median {statistics.median(timings) * 1000:8.1f} ms")
+    print(f"  max    {max(timings) * 1000:8.1f} ms")
+    print(f"  heavy modules loaded: {', '.join(loaded) or 'none'}")
+    print(f"  files created: {', '.join(created) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
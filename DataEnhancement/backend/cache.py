@@ -0,0 +1,203 @@
+"""Persistent cache of enrichment lookups.
+
+Results are stored in SQLite under (source, normalized key) and expire after
+a per-source TTL, so a company enriched last week isn't scraped again. A
+bounded in-process LRU sits in front of the database. Errors, "not found"
+results and fallback guesses are never cached.
+
+TTLs default to CACHE_TTL_DAYS below and can be overridden per source, e.g.
+CACHE_TTL_GROWJO_HTTP=7 (days). A TTL of 0 turns caching off for a source.
+"""
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+from functools import wraps
+from collections import OrderedDict
+from metrics import cache_requests
+
+CACHE_DB = os.getenv("CACHE_DB", os.path.join("output", "cache.db"))
+CACHE_LRU_SIZE = int(os.getenv("CACHE_LRU_SIZE", 10000))
+CACHE_TTL_DAYS = {
+    "website_search": 90,
+    "growjo_http": 30,
+    "apollo": 30,
+}
+CACHE_TTLS = {
+    source: float(os.getenv(f"CACHE_TTL_{source.upper()}", days)) * 24 * 3600
+    for source, days in CACHE_TTL_DAYS.items()
+}
+# Expired rows are purged after this many writes
+CACHE_PURGE_EVERY = 1000
+
+logger = logging.getLogger(__name__)
+
+
+def ttl_seconds(source):
+    return CACHE_TTLS.get(source, 0)
+
+
+def is_cacheable(result):
+    if not result:
+        return False
+    if isinstance(result, dict):
+        return not (result.get("error") or result.get("Error")) and result.get("source") != "fallback"
+    return True
+
+
+class EnrichmentCache:
+    """Two-tier (LRU, then SQLite) cache of JSON-serializable results."""
+
+    def __init__(self, path=CACHE_DB, lru_size=CACHE_LRU_SIZE):
+        self.path = path
+        self.lru_size = lru_size
+        self._lru = OrderedDict()
+        self._lru_lock = threading.Lock()
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._create_schema(conn)
+        return conn
+
+    def _create_schema(self, conn):
+        with self._init_lock:
+            if self._initialized:
+                return
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    source TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (source, key)
+                )
+            """)
+            conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+            conn.commit()
+            self._initialized = True
+
+    def _remember(self, source, key, value, expires_at):
+        with self._lru_lock:
+            self._lru[(source, key)] = (value, expires_at)
+            self._lru.move_to_end((source, key))
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+
+    def get(self, source, key):
+        """The cached result for ``key``, or None. Each call gets its own copy."""
+        now = time.time()
+        with self._lru_lock:
+            entry = self._lru.get((source, key))
+            if entry is not None:
+                if entry[1] > now:
+                    self._lru.move_to_end((source, key))
+                else:
+                    del self._lru[(source, key)]
+                    entry = None
+
+        if entry is None:
+            try:
+                row = self._conn().execute(
+                    "SELECT value, expires_at FROM cache WHERE source = ? AND key = ? AND expires_at > ?",
+                    (source, key, now)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"Cache read failed for {source} {key!r}: {e}")
+                row = None
+            if row is not None:
+                entry = row
+                self._remember(source, key, *row)
+
+        cache_requests.inc(source, "hit" if entry is not None else "miss")
+        return json.loads(entry[0]) if entry is not None else None
+
+    def put(self, source, key, result):
+        ttl = ttl_seconds(source)
+        if ttl <= 0 or not is_cacheable(result):
+            return
+        value = json.dumps(result, default=str)
+        expires_at = time.time() + ttl
+        self._remember(source, key, value, expires_at)
+        try:
+            conn = self._conn()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (source, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (source, key, value, expires_at)
+                )
+                with self._writes_lock:
+                    self._writes += 1
+                    purge = self._writes % CACHE_PURGE_EVERY == 0
+                if purge:
+                    conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+        except sqlite3.Error as e:
+            logger.warning(f"Cache write failed for {source} {key!r}: {e}")
+
+
+enrichment_cache = EnrichmentCache()
+
+
+def cached(source, key):
+    """Serve a sync or async lookup from the enrichment cache.
+
+    The cache key is ``key`` applied to the first argument, plus any other
+    arguments. Calls whose key is empty bypass the cache. A result's
+    "company" field is set to the caller's own spelling of the name.
+    """
+    def cache_key(args, kwargs):
+        normalized = key(args[0]) if args and isinstance(args[0], str) else None
+        if not normalized:
+            return None
+        if len(args) > 1 or kwargs:
+            normalized += "|" + json.dumps([args[1:], sorted(kwargs.items())], default=str)
+        return normalized
+
+    def usable(entry_key):
+        return entry_key is not None and ttl_seconds(source) > 0
+
+    def as_requested(result, args):
+        # Callers sharing a key may spell the company differently; each gets its own spelling back
+        if isinstance(result, dict) and "company" in result:
+            result["company"] = args[0]
+        return result
+
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                entry_key = cache_key(args, kwargs)
+                if not usable(entry_key):
+                    return await fn(*args, **kwargs)
+                # SQLite calls are short but blocking, so keep them off the event loop
+                result = await asyncio.to_thread(enrichment_cache.get, source, entry_key)
+                if result is None:
+                    result = await fn(*args, **kwargs)
+                    await asyncio.to_thread(enrichment_cache.put, source, entry_key, result)
+                return as_requested(result, args)
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            entry_key = cache_key(args, kwargs)
+            if not usable(entry_key):
+                return fn(*args, **kwargs)
+            result = enrichment_cache.get(source, entry_key)
+            if result is None:
+                result = fn(*args, **kwargs)
+                enrichment_cache.put(source, entry_key, result)
+            return as_requested(result, args)
+        return wrapper
+    return decorator
@@ -0,0 +1,154 @@
+import os
+import re
+import logging
+from collections import OrderedDict
+from scheduler import scheduler, BULK
+from metrics import cache_requests
+from logging_config import log_context
+from task_queue import task_queue, TaskFailedError
+
+# Distinct companies an upload remembers results for, across its chunks
+DEDUPE_CACHE_SIZE = int(os.getenv("DEDUPE_CACHE_SIZE", 10000))
+
+logger = logging.getLogger(__name__)
+
+# Legal suffixes that don't distinguish one company from another
+COMPANY_SUFFIXES = {
+    "inc", "incorporated", "llc", "llp", "ltd", "limited", "corp", "corporation",
+    "co", "company", "plc", "gmbh", "ag", "sa", "pvt", "pty"
+}
+
+
+def normalize_company_key(company_name):
+    """Reduce a company name to a key that matches its other spellings in a lead list.
+
+    'Acme, Inc.', 'ACME Inc' and 'acme' all map to 'acme'.
+    """
+    words = re.sub(r"[^\w\s]", " ", company_name.lower().replace("&", " and ")).split()
+    while len(words) > 1 and words[-1] in COMPANY_SUFFIXES:
+        words.pop()
+    return " ".join(words) or company_name.strip().lower()
+
+
+class RecentResults:
+    """Bounded LRU of enrichment results by normalized company key.
+
+    Keeps an upload's memory flat however many distinct companies it has.
+    A repeat further back than ``maxsize`` companies is enriched again, and
+    is then usually served by the persistent enrichment cache.
+    """
+
+    def __init__(self, maxsize=DEDUPE_CACHE_SIZE):
+        self.maxsize = maxsize
+        # Distinct lookups stored so far, including evicted ones
+        self.enriched = 0
+        self._results = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._results
+
+    def __getitem__(self, key):
+        self._results.move_to_end(key)
+        return self._results[key]
+
+    def __setitem__(self, key, result):
+        self.enriched += 1
+        self._results[key] = result
+        self._results.move_to_end(key)
+        while len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+
+    def __len__(self):
+        return len(self._results)
+
+
+def enrich_company(company_name):
+    """Run the website, Growjo and Apollo lookups for a single company."""
+    from scraper.revenueScraper import get_company_revenue_from_growjo
+    from scraper.websiteNameScraper import find_company_website
+    from scraper.apollo_scraper import enrich_single_company
+
+    company_data = {'company': company_name}
+
+    try:
+        # Find company website
+        website = find_company_website(company_name)
+        if website:
+            company_data['website'] = website
+            logger.debug(f'Found website for {company_name}: {website}')
+
+            # Get revenue data from Growjo
+            revenue_data = get_company_revenue_from_growjo(company_name)
+            if 'error' not in revenue_data:
+                company_data.update(revenue_data)
+                logger.debug(f'Found revenue data for {company_name}')
+
+            # Get Apollo data
+            apollo_data = enrich_single_company(website)
+            if apollo_data and 'error' not in apollo_data:
+                company_data.update(apollo_data)
+                logger.debug(f'Found Apollo data for {company_name}')
+        else:
+            company_data['error'] = 'Could not find company website'
+
+    except Exception as e:
+        error_msg = str(e)
+        logger.error(f'Error enriching {company_name}: {error_msg}')
+        company_data['error'] = error_msg
+
+    return company_data
+
+
+def enrich_unique(companies, seen=None, priority=BULK, user=None, should_stop=None):
+    """Yield enriched rows for ``companies``, enriching each distinct company only once.
+
+    ``seen`` maps normalized company keys to enrichment results (a
+    RecentResults, or any dict) and can be passed in again to dedupe across
+    several chunks of the same upload.
+    Every row gets a copy of the shared result under its own company name.
+    The distinct companies are queued on the scheduler together under
+    ``user``'s fair share, so they run in parallel; rows are still yielded in
+    input order. With a shared task queue configured they go to the worker
+    processes instead. Once ``should_stop()`` returns True, lookups that haven't
+    started are cancelled and no further rows are yielded.
+    """
+    seen = {} if seen is None else seen
+    # Results for this call's companies; ``seen`` may drop them while the call runs
+    known = {}
+    pending = {}
+    for company_name in companies:
+        key = normalize_company_key(company_name)
+        if key in known or key in pending:
+            cache_requests.inc("dedupe", "hit")
+        elif key in seen:
+            cache_requests.inc("dedupe", "hit")
+            known[key] = seen[key]
+        else:
+            cache_requests.inc("dedupe", "miss")
+            if task_queue.enabled:
+                pending[key] = task_queue.submit("enrich", company_name, priority=priority, user=user)
+                continue
+            # The scheduler runs the lookup in this context, so its log lines carry the company
+            with log_context(company=company_name):
+                pending[key] = scheduler.submit(
+                    enrich_company, company_name, priority=priority, user=user
+                )
+
+    try:
+        for company_name in companies:
+            if should_stop and should_stop():
+                return
+            key = normalize_company_key(company_name)
+            if key in known:
+                logger.debug(f'Reusing enrichment of {key!r} for {company_name}')
+            else:
+                try:
+                    known[key] = pending.pop(key).result()
+                except TaskFailedError as e:
+                    known[key] = {'company': company_name, 'error': str(e)}
+                seen[key] = known[key]
+            yield dict(known[key], company=company_name)
+    finally:
+        # Drop lookups nobody will read, e.g. after a cancel or a closed stream
+        for future in pending.values():
+            future.cancel()
@@ -0,0 +1,57 @@
+import os
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 500))
+
+# Fixed column order for processed CSVs, so chunks appended one by one line up
+OUTPUT_COLUMNS = [
+    "company", "website", "estimated_revenue", "matched_variant", "url", "source",
+    "domain", "name", "website_url", "linkedin_url", "founded_year",
+    "annual_revenue_printed", "employees_count", "industry", "location", "error"
+]
+
+
+class EmptyUploadError(ValueError):
+    """Raised when an uploaded CSV has no header row at all."""
+
+
+def find_company_column(filepath):
+    """Return the name of the company column in an uploaded CSV, or None.
+
+    Only the header is read. Column names are matched the same way the
+    upload endpoint always normalized them: stripped and title-cased, with
+    'Company Name' accepted as a fallback for 'Company'.
+    """
+    import pandas as pd
+    try:
+        columns = pd.read_csv(filepath, nrows=0).columns
+    except pd.errors.EmptyDataError:
+        raise EmptyUploadError(filepath) from None
+    normalized = {col.strip().title(): col for col in columns}
+    return normalized.get("Company") or normalized.get("Company Name")
+
+
+def iter_company_chunks(filepath, column, chunksize=UPLOAD_CHUNK_SIZE):
+    """Yield lists of non-empty company names, reading the CSV chunk by chunk."""
+    import pandas as pd
+    for chunk in pd.read_csv(filepath, usecols=[column], chunksize=chunksize):
+        companies = [
+            str(company).strip() for company in chunk[column].dropna()
+            if str(company).strip()
+        ]
+        if companies:
+            yield companies
+
+
+def count_companies(filepath, column):
+    """Count the rows that will be enriched without loading the whole file."""
+    return sum(len(companies) for companies in iter_company_chunks(filepath, column))
+
+
+def append_results(output_path, rows):
+    """Append enriched rows to a processed CSV, writing the header on first use."""
+    import pandas as pd
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    write_header = not os.path.exists(output_path)
+    pd.DataFrame(rows).reindex(columns=OUTPUT_COLUMNS).to_csv(
+        output_path, mode="a", header=write_header, index=False
+    )
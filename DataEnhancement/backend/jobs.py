@@ -0,0 +1,354 @@
+import os
+import time
+import uuid
+import socket
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from admission import get_controller
+from results_store import results_store
+from metrics import Gauge
+from profiling import propagate
+from logging_config import log_context
+
+JOB_RETENTION = int(os.getenv("JOB_RETENTION", 24 * 3600))  # Keep finished jobs for a day
+# How often a process refreshes the stored records of the jobs it runs, and how
+# old that heartbeat may get before another process treats the job as interrupted
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", 30))
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", 120))
+
+logger = logging.getLogger(__name__)
+
+
+def runner_id():
+    """Host and pid of this process, recorded on the jobs it runs."""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class Job:
+    """Progress and outcome of a single background job."""
+
+    def __init__(self, kind, owner=None, total=0, job_id=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.kind = kind
+        self.owner = owner
+        self.status = "queued"
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        # Rows already stored by an earlier run, which a resumed job skips
+        self.checkpointed = 0
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._cancel_callbacks = []
+
+    def record(self, failed=False):
+        """Count one processed row."""
+        with self._lock:
+            if failed:
+                self.failed += 1
+            else:
+                self.done += 1
+
+    @property
+    def finished(self):
+        return self.status in ("completed", "failed", "cancelled", "interrupted")
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def on_cancel(self, callback):
+        """Run ``callback`` when the job is cancelled, or right away if it already was.
+
+        Returns a function that unregisters the callback once it is no longer needed.
+        """
+        with self._lock:
+            if not self.cancelled:
+                self._cancel_callbacks.append(callback)
+                return lambda: self._remove_cancel_callback(callback)
+        callback()
+        return lambda: None
+
+    def _remove_cancel_callback(self, callback):
+        with self._lock:
+            if callback in self._cancel_callbacks:
+                self._cancel_callbacks.remove(callback)
+
+    def cancel(self):
+        """Ask the job to stop scheduling new rows. Returns False if it had already ended."""
+        with self._lock:
+            if self.finished or self.cancelled:
+                return False
+            self._cancel.set()
+            callbacks, self._cancel_callbacks = self._cancel_callbacks, []
+
+        logger.info(f"Cancelling job {self.id}")
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Cancel callback failed for job {self.id}: {e}")
+        return True
+
+    def eta_seconds(self):
+        """Estimate the remaining time from the average time per processed row."""
+        processed = self.done + self.failed
+        if self.finished or not self.started_at or not processed:
+            return None
+        elapsed = time.time() - self.started_at
+        remaining = max(self.total - processed, 0)
+        return round(elapsed / processed * remaining, 1)
+
+    def to_dict(self):
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "total": self.total,
+            "done": self.done,
+            "failed": self.failed,
+            "eta_seconds": self.eta_seconds(),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.error:
+            data["error"] = self.error
+        if self.status in ("completed", "cancelled"):
+            data["result"] = self.result
+        return data
+
+
+class JobManager:
+    """Runs jobs on bounded per-kind thread pools and keeps their state for polling.
+
+    Each job kind has an admission controller: its pool runs at most
+    ``max_concurrent`` jobs and at most ``max_queue`` more may wait. Past that,
+    submit() raises QueueFullError.
+
+    Jobs of a kind registered with ``resumable`` are also recorded in the
+    results store, with the process running them and a heartbeat refreshed
+    on every checkpoint and every JOB_HEARTBEAT_SECONDS. A stored job whose
+    heartbeat is older than JOB_STALE_SECONDS lost its process (status
+    "interrupted"); it, or one that failed or was cancelled, can be resumed
+    by any process sharing the store and skips the rows it already stored.
+    Cancelling a job another process runs records the request in the store;
+    that process cancels the job at its next checkpoint or heartbeat.
+    """
+
+    def __init__(self):
+        self._executors = {}
+        self._jobs = {}
+        self._resumable = {}
+        self._lock = threading.Lock()
+        self._heartbeat_thread = None
+
+    def resumable(self, kind, cleanup=None):
+        """Decorator registering ``fn`` as the body of resumable ``kind`` jobs.
+
+        Their arguments must be JSON serializable. ``cleanup(*args, **kwargs)``
+        runs when such a job expires, to remove inputs kept for resuming.
+        """
+        def decorator(fn):
+            self._resumable[kind] = (fn, cleanup)
+            return fn
+        return decorator
+
+    def _executor_for(self, kind):
+        with self._lock:
+            if kind not in self._executors:
+                self._executors[kind] = ThreadPoolExecutor(
+                    max_workers=get_controller(kind).max_concurrent,
+                    thread_name_prefix=f"job-{kind}"
+                )
+            return self._executors[kind]
+
+    def submit(self, kind, fn, *args, owner=None, total=0, **kwargs):
+        """Queue ``fn(job, *args, **kwargs)`` and return the new job right away."""
+        get_controller(kind).admit()
+        job = Job(kind, owner=owner, total=total)
+        if kind in self._resumable:
+            try:
+                results_store.save_job(
+                    job.id, kind, owner, total, {"args": args, "kwargs": kwargs}, job.status, job.created_at,
+                    runner=runner_id()
+                )
+            except Exception:
+                get_controller(kind).withdraw()
+                raise
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._start(job, fn, args, kwargs)
+        logger.info(f"Queued {kind} job {job.id} ({total} rows)")
+        return job
+
+    def resume(self, job_id):
+        """Run a stored job again from its first row that wasn't checkpointed.
+
+        Raises KeyError for unknown jobs, ValueError for jobs that are still
+        running, already completed or not resumable, and QueueFullError.
+        """
+        job, params = self._load(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        if job.kind not in self._resumable:
+            raise ValueError(f"{job.kind} jobs cannot be resumed")
+        if job.status == "completed":
+            raise ValueError("Job already completed")
+        with self._lock:
+            live = self._jobs.get(job_id)
+        if live is not None and not live.finished:
+            raise ValueError(f"Job is already {live.status}")
+        if not job.finished:
+            raise ValueError(f"Job is still {job.status} in another process")
+
+        get_controller(job.kind).admit()
+        # Only one caller, in this process or any other, may win a job back
+        if not results_store.claim_job(job_id, runner_id(), time.time() - JOB_STALE_SECONDS):
+            get_controller(job.kind).withdraw()
+            raise ValueError("Job was resumed by another request")
+        job.status = "queued"
+        with self._lock:
+            self._jobs[job_id] = job
+        self._start(job, self._resumable[job.kind][0], params["args"], params["kwargs"])
+        logger.info(f"Resuming {job.kind} job {job_id} after {job.checkpointed} stored rows")
+        return job
+
+    def get(self, job_id):
+        """The job, from memory or, for jobs this process didn't run, the results store."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            job, _ = self._load(job_id)
+        return job
+
+    def _load(self, job_id):
+        """Rebuild a job from its stored record; returns (job, params) or (None, None)."""
+        record = results_store.get_job(job_id)
+        if record is None:
+            return None, None
+        job = Job(record["kind"], owner=record["owner"], total=record["total"], job_id=job_id)
+        job.created_at = record["created_at"]
+        # Records stored before jobs had a start time
+        job.started_at = record["started_at"] or record["created_at"]
+        job.result = record["result"]
+        rows, errors = results_store.progress(job_id)
+        job.done, job.failed = rows - errors, errors
+        job.checkpointed = rows
+        if record["status"] in ("completed", "failed", "cancelled"):
+            job.status = record["status"]
+        elif record["updated_at"] < time.time() - JOB_STALE_SECONDS:
+            # Queued or running in a process that stopped sending heartbeats
+            job.status = "interrupted"
+        else:
+            # Queued or running in another live process
+            job.status = record["status"]
+        if job.finished:
+            job.finished_at = record["updated_at"]
+        return job, record["params"]
+
+    def _start(self, job, fn, args, kwargs):
+        if job.kind in self._resumable:
+            self._start_heartbeat()
+        # _run always calls fn, so a profiled request can keep its profile open for the job
+        self._executor_for(job.kind).submit(self._run, job, propagate(fn, hold=True), args, kwargs)
+
+    def _start_heartbeat(self):
+        with self._lock:
+            if self._heartbeat_thread is None:
+                self._heartbeat_thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+                self._heartbeat_thread.start()
+
+    def _heartbeat(self):
+        """Keep the stored records of this process's unfinished jobs fresh, even between checkpoints."""
+        while True:
+            time.sleep(JOB_HEARTBEAT_SECONDS)
+            with self._lock:
+                live = {
+                    job.id: job for job in self._jobs.values() if not job.finished and job.kind in self._resumable
+                }
+            try:
+                results_store.touch_jobs(list(live))
+                for job_id in results_store.cancel_requests(list(live)):
+                    live[job_id].cancel()
+            except Exception as e:
+                logger.warning(f"Could not refresh job heartbeats: {e}")
+
+    def cancel(self, job_id):
+        """Cancel a job, here or in the process running it. Returns False if it had already ended."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None and (not job.finished or job.kind not in self._resumable):
+            return job.cancel()
+        # Stored jobs may be running in another process, or resumed there since this one ran them
+        return results_store.request_cancel(job_id, time.time() - JOB_STALE_SECONDS)
+
+    def _run(self, job, fn, args, kwargs):
+        with get_controller(job.kind).slot(), log_context(job_id=job.id):
+            job.status = "running"
+            job.started_at = time.time()
+            resumable = job.kind in self._resumable
+            try:
+                if resumable:
+                    results_store.set_job_status(job.id, job.status, started_at=job.started_at)
+                # Jobs cancelled while queued still run, so they can clean up
+                # their inputs, but they stop before doing any row
+                job.result = fn(job, *args, **kwargs)
+                job.status = "cancelled" if job.cancelled else "completed"
+                logger.info(f"Job {job.id} {job.status}: {job.done} done, {job.failed} failed")
+            except Exception as e:
+                job.error = str(e)
+                job.status = "failed"
+                logger.error(f"Job {job.id} failed: {e}")
+            finally:
+                job.finished_at = time.time()
+                if resumable:
+                    try:
+                        results_store.set_job_status(job.id, job.status, job.result)
+                    except Exception as e:
+                        logger.warning(f"Could not record the end of job {job.id}: {e}")
+
+    def status_counts(self):
+        with self._lock:
+            return Counter((job.kind, job.status) for job in self._jobs.values())
+
+    def _prune(self):
+        cutoff = time.time() - JOB_RETENTION
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            job = self._jobs.pop(job_id)
+            if job.kind not in self._resumable:
+                results_store.delete_job(job_id)
+
+        # Stored jobs, including ones interrupted by a restart, expire the same way
+        for record in results_store.expired_jobs(cutoff):
+            live = self._jobs.get(record["job_id"])
+            if live is not None and not live.finished:
+                continue
+            cleanup = self._resumable.get(record["kind"], (None, None))[1]
+            if cleanup:
+                try:
+                    cleanup(*record["params"]["args"], **record["params"]["kwargs"])
+                except Exception as e:
+                    logger.warning(f"Cleanup of expired job {record['job_id']} failed: {e}")
+            self._jobs.pop(record["job_id"], None)
+            results_store.delete_job(record["job_id"])
+
+
+job_manager = JobManager()
+
+Gauge(
+    "leadgen_jobs", "Background jobs kept for polling, by kind and status.", ["kind", "status"],
+    collect=job_manager.status_counts
+)
@@ -0,0 +1,127 @@
+"""Central, non-blocking logging setup.
+
+Every record goes through a QueueHandler on the root logger, so the thread
+that logs only enqueues it. A single QueueListener thread formats the records
+and writes them to the log file and stderr.
+
+Records carry structured fields (job_id, company, source, duration) taken from
+``extra=`` or from the surrounding ``log_context()``. DEBUG output is
+rate-limited per call site.
+"""
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.getenv("LOG_FILE", os.path.join("log", "app.log"))
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s%(fields)s"
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_BACKUPS = int(os.getenv("LOG_BACKUPS", 5))
+# At most this many DEBUG records per call site per window
+DEBUG_RATE_LIMIT = int(os.getenv("DEBUG_RATE_LIMIT", 20))
+DEBUG_RATE_WINDOW = float(os.getenv("DEBUG_RATE_WINDOW", 10))
+
+STRUCTURED_FIELDS = ("job_id", "company", "source", "duration")
+
+_context = contextvars.ContextVar("log_context", default={})
+_listener = None
+_configure_lock = threading.Lock()
+
+
+@contextmanager
+def log_context(**fields):
+    """Attach ``fields`` to every record logged by this thread inside the block."""
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Fills in the structured fields and renders them as ' key=value ...'."""
+
+    def filter(self, record):
+        context = _context.get()
+        parts = []
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is None:
+                value = context.get(field)
+                setattr(record, field, value)
+            if value is not None:
+                if field == "duration":
+                    value = f"{float(value):.3f}s"
+                parts.append(f"{field}={value}")
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            parts.append(f"suppressed={suppressed}")
+        record.fields = " [" + " ".join(parts) + "]" if parts else ""
+        return True
+
+
+class DebugRateLimitFilter(logging.Filter):
+    """Drops DEBUG records from a call site beyond ``limit`` per ``window`` seconds."""
+
+    def __init__(self, limit=DEBUG_RATE_LIMIT, window=DEBUG_RATE_WINDOW):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self._sites = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        site = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            started, count, dropped = self._sites.get(site, (now, 0, 0))
+            if now - started >= self.window:
+                # New window; report how much the last one dropped
+                record.suppressed = dropped
+                started, count, dropped = now, 0, 0
+            if count < self.limit:
+                self._sites[site] = (started, count + 1, dropped)
+                return True
+            self._sites[site] = (started, count, dropped + 1)
+            return False
+
+
+def configure_logging(log_file=LOG_FILE, level=LOG_LEVEL):
+    """Route all logging through a queue to the file and console handlers. Safe to call twice."""
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            return
+
+        os.makedirs(os.path.dirname(log_file) or ".", exist_ok=True)
+        formatter = logging.Formatter(LOG_FORMAT)
+        handlers = [
+            RotatingFileHandler(log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8"),
+            logging.StreamHandler(),
+        ]
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = QueueHandler(log_queue)
+        # Filters run on the logging thread, where the context is still set
+        queue_handler.addFilter(DebugRateLimitFilter())
+        queue_handler.addFilter(ContextFilter())
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(level)
+
+        _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
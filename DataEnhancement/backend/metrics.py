@@ -0,0 +1,254 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Metrics are created once at module level (here or in the module that owns
+the measured object) and registered automatically. Gauges may take a
+``collect`` callback that reads the current value at scrape time instead of
+being updated by hand.
+"""
+import time
+import asyncio
+import logging
+import threading
+from functools import wraps
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+logger = logging.getLogger(__name__)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels):
+        if len(labels) != len(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {labels}")
+        return tuple(str(label) for label in labels)
+
+    def samples(self):
+        """Yield (suffix, label values, extra labels, value) for every series."""
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield "", labels, None, value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for suffix, labels, extra, value in self.samples():
+            lines.append(
+                f"{self.name}{suffix}{_format_labels(self.labels, labels, extra)} {_format_value(value)}"
+            )
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def items(self):
+        """(label values, count) for every series."""
+        with self._lock:
+            return list(self._values.items())
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def __init__(self, name, documentation, labels=(), collect=None):
+        super().__init__(name, documentation, labels)
+        self._collect = collect
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def samples(self):
+        if self._collect is None:
+            yield from super().samples()
+            return
+        for labels, value in self._collect().items():
+            if not isinstance(labels, tuple):
+                labels = (labels,)
+            yield "", self._key(labels), None, value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, *labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, (list(counts), total)) for labels, (counts, total) in self._values.items()]
+        for labels, (counts, total) in items:
+            for bound, count in zip(self.buckets, counts):
+                yield "_bucket", labels, {"le": _format_value(bound)}, count
+            yield "_sum", labels, None, total
+            yield "_count", labels, None, counts[-1]
+
+
+def render():
+    """All registered metrics as Prometheus text."""
+    with _registry_lock:
+        metrics = list(_registry)
+    return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+# Enrichment sources: website_search, growjo_http, apollo, linkedin_selenium, growjo_selenium
+source_requests = Counter("leadgen_source_requests_total", "Calls made to each enrichment source.", ["source"])
+source_errors = Counter(
+    "leadgen_source_errors_total", "Source calls that raised or returned an error.", ["source"]
+)
+source_latency = Histogram(
+    "leadgen_source_latency_seconds", "Time spent in each enrichment source call.", ["source"]
+)
+
+http_requests = Counter(
+    "leadgen_http_requests_total", "HTTP requests served.", ["endpoint", "method", "status"]
+)
+http_latency = Histogram(
+    "leadgen_http_request_duration_seconds", "Time to produce each HTTP response.", ["endpoint", "method"]
+)
+
+browsers = Gauge("leadgen_active_browsers", "Selenium browsers currently open.", ["browser"])
+
+cache_requests = Counter("leadgen_cache_requests_total", "Cache lookups.", ["cache", "result"])
+
+
+def _cache_hit_ratios():
+    values = dict(cache_requests.items())
+    ratios = {}
+    for cache in {cache for cache, _ in values}:
+        hits = values.get((cache, "hit"), 0)
+        total = hits + values.get((cache, "miss"), 0)
+        ratios[(cache,)] = hits / total if total else 0.0
+    return ratios
+
+
+cache_hit_ratio = Gauge(
+    "leadgen_cache_hit_ratio", "Share of cache lookups that were hits.", ["cache"], collect=_cache_hit_ratios
+)
+
+
+def _is_error(result):
+    return isinstance(result, dict) and bool(result.get("error") or result.get("Error"))
+
+
+def _record(source, started, failed):
+    elapsed = time.perf_counter() - started
+    source_latency.observe(elapsed, source)
+    source_requests.inc(source)
+    if failed:
+        source_errors.inc(source)
+    logger.debug(
+        f"{source} call {'failed' if failed else 'finished'}",
+        extra={"source": source, "duration": elapsed}
+    )
+
+
+def observe_source(source):
+    """Count calls, errors and latency of a sync or async source function.
+
+    A call counts as an error if it raises or returns a dict with an error.
+    """
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    result = await fn(*args, **kwargs)
+                except Exception:
+                    _record(source, started, True)
+                    raise
+                _record(source, started, _is_error(result))
+                return result
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                _record(source, started, True)
+                raise
+            _record(source, started, _is_error(result))
+            return result
+        return wrapper
+    return decorator
+
+
+def track_browser(driver, browser):
+    """Count ``driver`` as open until its quit() is first called."""
+    browsers.inc(browser)
+    quit_driver = driver.quit
+    open_ = [True]
+    lock = threading.Lock()
+
+    def quit():
+        try:
+            quit_driver()
+        finally:
+            with lock:
+                if open_[0]:
+                    open_[0] = False
+                    browsers.dec(browser)
+
+    driver.quit = quit
+    return driver
@@ -0,0 +1,155 @@
+"""Opt-in sampling profiler for single requests.
+
+A request carrying ``X-Profile: <PROFILE_TOKEN>`` (or ``?profile=<PROFILE_TOKEN>``)
+gets its call stacks sampled every PROFILE_INTERVAL seconds. Work it hands to
+scraper workers or background jobs is followed too. When the request and
+everything it spawned has finished, the samples are written to
+``log/profile_*.folded`` in the folded-stack format that flamegraph.pl and
+speedscope read.
+
+Requests without the token only pay for a header lookup.
+"""
+import os
+import sys
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from collections import Counter
+from functools import wraps
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", 0.005))
+PROFILE_DIR = "log"
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar("profiler", default=None)
+
+
+def fold_stack(frame):
+    """Root-first 'func (file:line);...' string for a frame."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """Samples the stacks of the threads working for one request.
+
+    Each piece of work holds a reference; the profile is written once the
+    last one is released.
+    """
+
+    def __init__(self, label, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.filename = f"profile_{time.strftime('%Y%m%d-%H%M%S')}_{label}_{uuid.uuid4().hex[:8]}.folded"
+        self.stacks = Counter()
+        self._threads = Counter()
+        self._refs = 0
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, name="profiler", daemon=True).start()
+
+    def hold(self):
+        with self._lock:
+            self._refs += 1
+
+    def release(self):
+        with self._lock:
+            self._refs -= 1
+            if self._refs == 0:
+                self._done.set()
+
+    def attach(self, ident):
+        with self._lock:
+            self._threads[ident] += 1
+
+    def detach(self, ident):
+        with self._lock:
+            self._threads[ident] -= 1
+            if not self._threads[ident]:
+                del self._threads[ident]
+
+    def _run(self):
+        while not self._done.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                idents = list(self._threads)
+            for ident in idents:
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.stacks[fold_stack(frame)] += 1
+        self._write()
+
+    def _write(self):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, self.filename)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        logger.info(f"Wrote profile {path} ({sum(self.stacks.values())} samples)")
+
+
+def profiling_requested(request):
+    if not PROFILE_TOKEN:
+        return False
+    token = request.headers.get("X-Profile") or request.args.get("profile")
+    return token == PROFILE_TOKEN
+
+
+def start_request_profile(label):
+    """Start profiling the current thread.
+
+    Returns the profiler and a callable that ends this thread's part of it.
+    """
+    profiler = SamplingProfiler(label)
+    ident = threading.get_ident()
+    profiler.hold()
+    profiler.attach(ident)
+    _current.set(profiler)
+    profiler.start()
+
+    def finish():
+        # Request threads are reused, so don't leave the profile behind
+        _current.set(None)
+        profiler.detach(ident)
+        profiler.release()
+
+    return profiler, finish
+
+
+def propagate(fn, hold=False):
+    """Wrap ``fn`` so the active profile (if any) follows it onto another thread.
+
+    With ``hold`` the profile is kept open from now until ``fn`` has run, for
+    work queued past the end of the request; the caller must make sure ``fn``
+    is always called. Otherwise only the call itself is covered.
+    """
+    profiler = _current.get()
+    if profiler is None:
+        return fn
+    if hold:
+        profiler.hold()
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not hold:
+            profiler.hold()
+        ident = threading.get_ident()
+        profiler.attach(ident)
+        token = _current.set(profiler)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+            profiler.detach(ident)
+            profiler.release()
+
+    return wrapper
@@ -0,0 +1,89 @@
+import os
+import gzip
+import json
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this aren't worth compressing
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", 1024))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 4))
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/csv", "text/plain", "text/html"}
+# NaN from pandas rows becomes null instead of invalid JSON
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY if orjson else 0
+
+
+def dumps(obj):
+    """``obj`` as compact JSON bytes, through orjson when it is installed."""
+    if orjson is None:
+        return json.dumps(obj, default=str, separators=(",", ":")).encode("utf-8")
+    return orjson.dumps(obj, default=str, option=ORJSON_OPTIONS)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """jsonify() through orjson, encoding straight to the response body bytes."""
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options()).decode("utf-8")
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        options = self._options()
+        if self.compact is False or (self.compact is None and self._app.debug):
+            options |= orjson.OPT_INDENT_2
+        body = orjson.dumps(obj, default=self.default, option=options)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+    def _options(self):
+        options = ORJSON_OPTIONS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
+
+
+def accepted_encoding():
+    """Best content coding the client accepts, or None."""
+    available = ["br", "gzip"] if brotli else ["gzip"]
+    return request.accept_encodings.best_match(available)
+
+
+def compress_response(response):
+    """after_request hook compressing sizeable buffered responses."""
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    encoding = accepted_encoding()
+    if encoding == "br":
+        response.set_data(brotli.compress(data, quality=BROTLI_QUALITY))
+    elif encoding == "gzip":
+        response.set_data(gzip.compress(data, compresslevel=GZIP_LEVEL))
+    else:
+        return response
+    response.headers["Content-Encoding"] = encoding
+    return response
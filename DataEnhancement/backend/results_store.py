@@ -0,0 +1,272 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+RESULTS_DB = os.getenv("RESULTS_DB", os.path.join("output", "results.db"))
+
+# Columns pulled out of each row so they can be indexed, sorted and filtered on
+INDEXED_COLUMNS = ["company", "website", "estimated_revenue", "industry", "location", "error"]
+SORTABLE_COLUMNS = ["row_index"] + INDEXED_COLUMNS
+JOB_COLUMNS_ADDED = [
+    ("runner", "TEXT"),
+    ("started_at", "REAL"),
+    ("cancel_requested", "INTEGER NOT NULL DEFAULT 0"),
+]
+
+logger = logging.getLogger(__name__)
+
+
+class ResultsStore:
+    """SQLite store of enriched rows, queryable a page at a time per job.
+
+    Rows are written as soon as they are enriched, so together with the job
+    records kept here they double as checkpoints for resuming a job.
+    """
+
+    def __init__(self, path=RESULTS_DB):
+        self.path = path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._create_schema(conn)
+        return conn
+
+    def _create_schema(self, conn):
+        with self._init_lock:
+            if self._initialized:
+                return
+            columns = ", ".join(f"{col} TEXT" for col in INDEXED_COLUMNS)
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS results (
+                    job_id TEXT NOT NULL,
+                    row_index INTEGER NOT NULL,
+                    {columns},
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (job_id, row_index)
+                )
+            """)
+            for col in INDEXED_COLUMNS:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_results_{col} ON results (job_id, {col})")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    owner TEXT,
+                    total INTEGER NOT NULL,
+                    params TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    result TEXT,
+                    runner TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    updated_at REAL NOT NULL,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            # Stores created before jobs recorded these columns
+            existing = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for col, definition in JOB_COLUMNS_ADDED:
+                if col not in existing:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {col} {definition}")
+            conn.commit()
+            self._initialized = True
+
+    def append(self, job_id, start_index, rows):
+        """Store ``rows`` for a job, numbered from ``start_index``.
+
+        Also refreshes the job record's heartbeat, since each stored row is a
+        checkpoint, and returns whether the job was asked to stop through
+        request_cancel().
+        """
+        records = []
+        for offset, row in enumerate(rows):
+            # LinkedIn rows use their own key names
+            values = {
+                "company": row.get("company") or row.get("Business Name"),
+                "error": row.get("error") or row.get("Error"),
+            }
+            for col in INDEXED_COLUMNS:
+                values.setdefault(col, row.get(col))
+            records.append(
+                (job_id, start_index + offset, *(values[col] for col in INDEXED_COLUMNS),
+                 json.dumps(row, default=str))
+            )
+
+        placeholders = ", ".join("?" for _ in range(len(INDEXED_COLUMNS) + 3))
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO results (job_id, row_index, {', '.join(INDEXED_COLUMNS)}, data) "
+                f"VALUES ({placeholders})",
+                records
+            )
+            conn.execute("UPDATE jobs SET updated_at = ? WHERE job_id = ?", (time.time(), job_id))
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def page(self, job_id, offset=0, limit=100, sort=None, filters=None):
+        """Return (matching row count, rows) for one page of a job's results.
+
+        ``sort`` is a column name, prefixed with '-' for descending order;
+        text columns sort case-insensitively.
+        ``filters`` maps column names to case-insensitive substrings.
+        Raises ValueError for columns that can't be sorted or filtered on.
+        """
+        where = ["job_id = ?"]
+        params = [job_id]
+        for col, value in (filters or {}).items():
+            if col not in INDEXED_COLUMNS:
+                raise ValueError(f"Cannot filter on '{col}'")
+            where.append(f"{col} LIKE ? ESCAPE '\\'")
+            escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.append(f"%{escaped}%")
+
+        order = "row_index"
+        if sort:
+            col = sort.lstrip("-")
+            if col not in SORTABLE_COLUMNS:
+                raise ValueError(f"Cannot sort on '{col}'")
+            # Text columns sort case-insensitively, like the filters
+            collate = "" if col == "row_index" else " COLLATE NOCASE"
+            order = f"{col}{collate} {'DESC' if sort.startswith('-') else 'ASC'}, row_index"
+
+        conn = self._conn()
+        where_sql = " AND ".join(where)
+        total = conn.execute(f"SELECT COUNT(*) FROM results WHERE {where_sql}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT row_index, data FROM results WHERE {where_sql} ORDER BY {order} LIMIT ? OFFSET ?",
+            params + [limit, offset]
+        ).fetchall()
+        return total, [{"index": row["row_index"], **json.loads(row["data"])} for row in rows]
+
+    def progress(self, job_id):
+        """Return (stored rows, rows with an error) for a job."""
+        row = self._conn().execute(
+            "SELECT COUNT(*), COUNT(error) FROM results WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        return row[0], row[1]
+
+    def iter_rows(self, job_id, batch_size=500):
+        """Yield a job's stored rows in order, reading ``batch_size`` at a time."""
+        last = -1
+        while True:
+            rows = self._conn().execute(
+                "SELECT row_index, data FROM results WHERE job_id = ? AND row_index > ? "
+                "ORDER BY row_index LIMIT ?",
+                (job_id, last, batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield json.loads(row["data"])
+            last = rows[-1]["row_index"]
+
+    def save_job(self, job_id, kind, owner, total, params, status, created_at, runner=None):
+        """Record a job, run by process ``runner``, and the JSON-serializable ``params`` needed to run it again."""
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs "
+                "(job_id, kind, owner, total, params, status, runner, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, owner, total, json.dumps(params), status, runner, created_at, time.time())
+            )
+
+    def claim_job(self, job_id, runner, stale_before):
+        """Mark a job queued again under ``runner``, unless another process runs it.
+
+        Succeeds only for jobs that failed, were cancelled, or whose heartbeat
+        is older than ``stale_before``. Returns whether the job was claimed.
+        """
+        conn = self._conn()
+        with conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'queued', result = NULL, runner = ?, updated_at = ?, cancel_requested = 0 "
+                "WHERE job_id = ? AND (status IN ('failed', 'cancelled') "
+                "OR (status IN ('queued', 'running') AND updated_at < ?))",
+                (runner, time.time(), job_id, stale_before)
+            )
+        return cursor.rowcount == 1
+
+    def touch_jobs(self, job_ids):
+        """Refresh the heartbeat of jobs that are still queued or running."""
+        if not job_ids:
+            return
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                f"UPDATE jobs SET updated_at = ? WHERE job_id IN ({', '.join('?' for _ in job_ids)})",
+                (time.time(), *job_ids)
+            )
+
+    def request_cancel(self, job_id, stale_before):
+        """Ask the process running a job to cancel it.
+
+        Only jobs still queued or running with a heartbeat newer than
+        ``stale_before`` can be asked. Returns whether the request was recorded.
+        """
+        conn = self._conn()
+        with conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET cancel_requested = 1 "
+                "WHERE job_id = ? AND status IN ('queued', 'running') AND updated_at >= ?",
+                (job_id, stale_before)
+            )
+        return cursor.rowcount == 1
+
+    def cancel_requests(self, job_ids):
+        """The ids among ``job_ids`` of jobs asked to cancel."""
+        if not job_ids:
+            return []
+        rows = self._conn().execute(
+            f"SELECT job_id FROM jobs WHERE cancel_requested = 1 AND job_id IN ({', '.join('?' for _ in job_ids)})",
+            tuple(job_ids)
+        ).fetchall()
+        return [row["job_id"] for row in rows]
+
+    def set_job_status(self, job_id, status, result=None, started_at=None):
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, started_at = COALESCE(?, started_at), updated_at = ? "
+                "WHERE job_id = ?",
+                (status, json.dumps(result, default=str) if result is not None else None, started_at,
+                 time.time(), job_id)
+            )
+
+    def _job_record(self, row):
+        record = dict(row)
+        record["params"] = json.loads(record["params"])
+        record["result"] = json.loads(record["result"]) if record["result"] else None
+        return record
+
+    def get_job(self, job_id):
+        """The stored record of a job as a dict, or None."""
+        row = self._conn().execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._job_record(row) if row else None
+
+    def expired_jobs(self, cutoff):
+        """Records of jobs last updated before ``cutoff``."""
+        rows = self._conn().execute("SELECT * FROM jobs WHERE updated_at < ?", (cutoff,)).fetchall()
+        return [self._job_record(row) for row in rows]
+
+    def delete_job(self, job_id):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM results WHERE job_id = ?", (job_id,))
+            conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+
+results_store = ResultsStore()
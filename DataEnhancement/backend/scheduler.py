@@ -0,0 +1,191 @@
+import os
+import logging
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import Future
+from metrics import Gauge
+from profiling import propagate
+
+SCRAPER_WORKERS = int(os.getenv("SCRAPER_WORKERS", 8))
+# Workers that only ever pick up interactive work, so analysts never wait behind a bulk job
+INTERACTIVE_RESERVED_WORKERS = int(os.getenv("INTERACTIVE_RESERVED_WORKERS", 2))
+# Most bulk tasks one user may have running at once
+USER_MAX_CONCURRENT = int(os.getenv("USER_MAX_CONCURRENT", max(1, SCRAPER_WORKERS // 2)))
+# Relative bulk shares, e.g. "admin@leadgen.com=2,analyst@leadgen.com=1"; default 1
+FAIR_SHARE_WEIGHTS = os.getenv("FAIR_SHARE_WEIGHTS", "")
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+# Lane of the work running in the current context, so lower layers (e.g. the
+# scrapers' rate limits) can let interactive calls skip ahead of bulk ones
+current_priority = contextvars.ContextVar("scheduler_priority", default=BULK)
+
+
+class SharedLane:
+    """Lane of a call made on behalf of several callers: interactive once any of them is."""
+
+    def __init__(self, parent=None):
+        # The shared call this one is part of, if any
+        self.parent = parent
+        self.promoted = False
+
+    @property
+    def interactive(self):
+        return self.promoted or (self.parent is not None and self.parent.interactive)
+
+
+# Set around calls shared between callers (see singleflight)
+shared_lane = contextvars.ContextVar("scheduler_shared_lane", default=None)
+
+
+def is_interactive():
+    """Whether work in this context runs for an interactive caller."""
+    lane = shared_lane.get()
+    return current_priority.get() == INTERACTIVE or (lane is not None and lane.interactive)
+
+logger = logging.getLogger(__name__)
+
+
+def parse_weights(spec):
+    weights = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        user, _, weight = item.rpartition("=")
+        try:
+            weights[user.strip()] = max(1, int(weight))
+        except ValueError:
+            logger.warning(f"Ignoring invalid fair-share weight: {item}")
+    return weights
+
+
+class PriorityScheduler:
+    """Shared pool of scraper workers with an interactive lane ahead of bulk work.
+
+    Idle workers always take queued interactive calls first. Reserved workers
+    take nothing else, which keeps interactive queueing delay near zero even
+    while a large upload is filling the bulk lane.
+
+    Bulk work is queued per user and handed out by deficit round-robin: each
+    turn a user earns credit equal to their weight and spends one credit per
+    task, so users with queued rows share the workers in proportion to their
+    weights however many rows each has. A user never has more than
+    ``user_cap`` bulk tasks running at once.
+    """
+
+    def __init__(self, workers=SCRAPER_WORKERS, reserved=INTERACTIVE_RESERVED_WORKERS,
+                 user_cap=USER_MAX_CONCURRENT, weights=None):
+        self.user_cap = user_cap
+        self._weights = parse_weights(FAIR_SHARE_WEIGHTS) if weights is None else weights
+        self._interactive = deque()
+        self._bulk = {}  # user -> deque of tasks
+        self._rotation = deque()  # users with queued bulk work, in round-robin order
+        self._deficit = {}
+        self._running = {}
+        self._cond = threading.Condition()
+        reserved = min(reserved, workers - 1)
+        for i in range(workers):
+            threading.Thread(
+                target=self._worker, args=(i >= reserved,), name=f"scraper-{i}", daemon=True
+            ).start()
+
+    def submit(self, fn, *args, priority=BULK, user=None, **kwargs):
+        """Queue ``fn(*args, **kwargs)`` on the given lane and return a Future."""
+        future = Future()
+        # Run in the caller's context so log fields such as job_id carry over
+        task = (future, contextvars.copy_context(), propagate(fn), args, kwargs)
+        with self._cond:
+            if priority == INTERACTIVE:
+                self._interactive.append(task)
+            else:
+                if user not in self._bulk:
+                    self._bulk[user] = deque()
+                    self._rotation.append(user)
+                    self._deficit[user] = 0
+                self._bulk[user].append(task)
+            self._cond.notify_all()
+        return future
+
+    def run(self, fn, *args, priority=INTERACTIVE, **kwargs):
+        """Submit and wait for the result."""
+        return self.submit(fn, *args, priority=priority, **kwargs).result()
+
+    def queue_depths(self):
+        with self._cond:
+            return {
+                INTERACTIVE: len(self._interactive),
+                BULK: sum(len(tasks) for tasks in self._bulk.values()),
+            }
+
+    def user_queue_depths(self):
+        with self._cond:
+            return {user: len(tasks) for user, tasks in self._bulk.items()}
+
+    def _next_bulk(self):
+        """Pick the next bulk task by deficit round-robin, or None if every user is capped."""
+        for _ in range(len(self._rotation)):
+            user = self._rotation[0]
+            if self._running.get(user, 0) >= self.user_cap:
+                self._rotation.rotate(-1)
+                continue
+
+            if self._deficit[user] < 1:
+                self._deficit[user] += self._weights.get(user, 1)
+            self._deficit[user] -= 1
+            task = self._bulk[user].popleft()
+
+            if not self._bulk[user]:
+                # Idle users don't bank credit
+                del self._bulk[user]
+                del self._deficit[user]
+                self._rotation.popleft()
+            elif self._deficit[user] < 1:
+                self._rotation.rotate(-1)
+            self._running[user] = self._running.get(user, 0) + 1
+            return BULK, user, task
+        return None
+
+    def _next_task(self, take_bulk):
+        if self._interactive:
+            return INTERACTIVE, None, self._interactive.popleft()
+        if take_bulk:
+            return self._next_bulk()
+        return None
+
+    @staticmethod
+    def _call(lane, fn, args, kwargs):
+        current_priority.set(lane)
+        return fn(*args, **kwargs)
+
+    def _worker(self, take_bulk):
+        while True:
+            with self._cond:
+                picked = self._next_task(take_bulk)
+                while picked is None:
+                    self._cond.wait()
+                    picked = self._next_task(take_bulk)
+                lane, user, (future, context, fn, args, kwargs) = picked
+
+            try:
+                # Skip work whose caller has already cancelled it
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(context.run(self._call, lane, fn, args, kwargs))
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                if lane == BULK:
+                    with self._cond:
+                        self._running[user] -= 1
+                        if not self._running[user]:
+                            del self._running[user]
+                        # A user under their cap again may unblock waiting workers
+                        self._cond.notify_all()
+
+
+scheduler = PriorityScheduler()
+
+Gauge(
+    "leadgen_scheduler_queue_depth", "Scraper calls waiting for a worker.", ["lane"],
+    collect=scheduler.queue_depths
+)
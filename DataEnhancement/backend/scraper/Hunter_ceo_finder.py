@@ -1,9 +1,8 @@
-import requests
 import pandas as pd
-import time
 import os
 import sys
 from dotenv import load_dotenv
+from scraper import http_client
 
 # Load environment variables
 load_dotenv()
@@ -25,7 +24,7 @@ class CompanyInfoRetriever:
         }
         
         try:
-            response = requests.get(url, params=params)
+            response = http_client.get(url, params=params)
             if response.status_code == 200:
                 data = response.json()
                 if data.get('data', {}).get('domain'):
@@ -51,7 +50,7 @@ class CompanyInfoRetriever:
             params["seniority"] = seniority
             
         try:
-            response = requests.get(url, params=params)
+            response = http_client.get(url, params=params)
             if response.status_code == 200:
                 data = response.json()
                 return data.get('data', {}).get('emails', [])
@@ -200,8 +199,8 @@ def read_companies_from_csv(csv_file_path, company_name_column='company_name'):
 def main():
     # Parse command line arguments
     if len(sys.argv) < 2:
-        print("Usage: python script.py <path_to_csv_file> [company_name_column]")
-        print("Example: python script.py companies.csv company_name")
+        print("Usage (from the backend directory): python -m scraper.Hunter_ceo_finder <path_to_csv_file> [company_name_column]")
+        print("Example: python -m scraper.Hunter_ceo_finder companies.csv company_name")
         return
         
     csv_file_path = sys.argv[1]
@@ -232,9 +231,6 @@ def main():
         result = retriever.get_company_ceo_info(company)
         results.append(result)
         print(f"Status: {result['status']}")
-        if i < len(companies) - 1:  # Don't sleep after the last item
-            print(f"Waiting 2 seconds before next company...")
-            time.sleep(2)  # Rate limiting to avoid hitting API limits
     
     # Convert to DataFrame and save to CSV
     output_file = "company_ceo_data_results.csv"
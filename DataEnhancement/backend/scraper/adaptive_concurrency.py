@@ -0,0 +1,148 @@
+"""AIMD concurrency limits for scraper HTTP calls, per provider.
+
+Each provider (a rate limit bucket such as growjo.com) has a limit on the
+requests it may have in flight from this process. Extra callers, sync or
+async, wait their turn: interactive callers in FIFO order ahead of all bulk
+callers, which are FIFO among themselves. Interactive callers may also use
+ADAPTIVE_INTERACTIVE_HEADROOM slots above the limit, so they are not held up
+by slow bulk calls. The limit follows the provider's real capacity:
+- it grows by about one for every limit's worth of calls that succeed
+  within ADAPTIVE_LATENCY_TARGET while the limit is in use;
+- it is multiplied by ADAPTIVE_DECREASE when a call fails, at most once for
+  the calls already in flight when it was last cut.
+"""
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from metrics import Gauge
+
+ADAPTIVE_INITIAL_LIMIT = float(os.getenv("ADAPTIVE_INITIAL_LIMIT", 4))
+ADAPTIVE_MIN_LIMIT = float(os.getenv("ADAPTIVE_MIN_LIMIT", 1))
+ADAPTIVE_MAX_LIMIT = float(os.getenv("ADAPTIVE_MAX_LIMIT", 32))
+ADAPTIVE_LATENCY_TARGET = float(os.getenv("ADAPTIVE_LATENCY_TARGET", 2))
+ADAPTIVE_DECREASE = float(os.getenv("ADAPTIVE_DECREASE", 0.5))
+ADAPTIVE_INTERACTIVE_HEADROOM = int(os.getenv("ADAPTIVE_INTERACTIVE_HEADROOM", 1))
+
+
+class _Waiter:
+    def __init__(self, loop=None):
+        self.granted = False
+        self.loop = loop
+        if loop is None:
+            self.event = threading.Event()
+        else:
+            self.future = loop.create_future()
+
+    def wake(self):
+        self.granted = True
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(lambda: self.future.done() or self.future.set_result(None))
+
+
+class AdaptiveLimiter:
+    """Concurrency limit for one provider, adjusted by AIMD."""
+
+    def __init__(self, provider, initial=ADAPTIVE_INITIAL_LIMIT,
+                 minimum=ADAPTIVE_MIN_LIMIT, maximum=ADAPTIVE_MAX_LIMIT):
+        self.provider = provider
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self._interactive_waiters = deque()
+        self._bulk_waiters = deque()
+        self._decreased_at = 0.0
+        self._lock = threading.Lock()
+
+    def _capacity(self, interactive):
+        return max(int(self.limit), 1) + (ADAPTIVE_INTERACTIVE_HEADROOM if interactive else 0)
+
+    def _queue(self, interactive):
+        return self._interactive_waiters if interactive else self._bulk_waiters
+
+    def _try_acquire(self, interactive, loop=None):
+        """Take a slot, or queue and return a waiter to be woken with one."""
+        with self._lock:
+            ahead = self._interactive_waiters or (not interactive and self._bulk_waiters)
+            if not ahead and self.in_flight < self._capacity(interactive):
+                self.in_flight += 1
+                return None
+            waiter = _Waiter(loop)
+            self._queue(interactive).append(waiter)
+            return waiter
+
+    def acquire(self, interactive=False):
+        """Block until a slot is free; returns the start time to pass to release()."""
+        waiter = self._try_acquire(interactive)
+        if waiter is not None:
+            waiter.event.wait()
+        return time.monotonic()
+
+    async def acquire_async(self, interactive=False):
+        """Async variant of acquire()."""
+        waiter = self._try_acquire(interactive, asyncio.get_running_loop())
+        if waiter is not None:
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                with self._lock:
+                    granted = waiter.granted
+                    if not granted:
+                        self._queue(interactive).remove(waiter)
+                if granted:
+                    self.release(None, None)
+                raise
+        return time.monotonic()
+
+    def release(self, started, failed):
+        """Free a slot and adjust the limit; ``failed`` None means the call ended without an outcome."""
+        now = time.monotonic()
+        with self._lock:
+            if failed:
+                # Calls started before the last cut were sent at the old limit; don't cut again for them
+                if started is None or started >= self._decreased_at:
+                    self.limit = max(self.minimum, self.limit * ADAPTIVE_DECREASE)
+                    self._decreased_at = now
+            elif failed is not None and now - started <= ADAPTIVE_LATENCY_TARGET:
+                if self.in_flight >= int(self.limit):
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.in_flight -= 1
+            for interactive in (True, False):
+                waiters = self._queue(interactive)
+                while waiters and self.in_flight < self._capacity(interactive):
+                    self.in_flight += 1
+                    waiters.popleft().wake()
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def limiter_for(provider):
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            limiter = _limiters[provider] = AdaptiveLimiter(provider)
+        return limiter
+
+
+def _collect(attribute):
+    def collect():
+        with _limiters_lock:
+            limiters = list(_limiters.values())
+        return {(limiter.provider,): getattr(limiter, attribute) for limiter in limiters}
+    return collect
+
+
+concurrency_limit = Gauge(
+    "leadgen_adaptive_concurrency_limit", "Current AIMD concurrency limit per provider.", ["provider"],
+    collect=_collect("limit")
+)
+concurrency_in_flight = Gauge(
+    "leadgen_adaptive_concurrency_in_flight", "Scraper requests in flight per provider.", ["provider"],
+    collect=_collect("in_flight")
+)
@@ -1,10 +1,12 @@
-import requests
+import httpx
 import os
 import logging
-from time import sleep
-from random import uniform
 from urllib.parse import urlparse
 from dotenv import load_dotenv
+from metrics import observe_source
+from scraper import http_client
+from singleflight import single_flight, domain_key
+from cache import cached
 
 load_dotenv()
 logger = logging.getLogger(__name__)
@@ -26,67 +28,109 @@ def extract_domain(url):
         logger.error(f"Error extracting domain from {url}: {str(e)}")
         return None
 
-def enrich_single_company(url_or_domain):
-    """Call Apollo API to enrich company data."""
+APOLLO_ENRICH_URL = "https://api.apollo.io/api/v1/organizations/enrich"
+
+def resolve_domain(url_or_domain):
+    """Validate the input and return (domain, error_result)."""
     if not APOLLO_API_KEY:
-        return {"error": "Apollo API key not configured"}
+        return None, {"error": "Apollo API key not configured"}
 
     if not url_or_domain:
-        return {"error": "No URL or domain provided"}
+        return None, {"error": "No URL or domain provided"}
 
     # Extract domain if a URL was provided
     domain = extract_domain(url_or_domain) if url_or_domain.startswith('http') else url_or_domain
     if not domain:
-        return {"error": f"Could not extract domain from {url_or_domain}"}
+        return None, {"error": f"Could not extract domain from {url_or_domain}"}
+    return domain, None
 
-    url = "https://api.apollo.io/api/v1/organizations/enrich"
-    headers = {
+def apollo_headers():
+    return {
         "accept": "application/json",
         "Cache-Control": "no-cache",
         "Content-Type": "application/json",
         "X-Api-Key": APOLLO_API_KEY
     }
+
+def parse_organization(domain, data):
+    """Turn an Apollo enrich response into our flat result dict."""
+    if not data.get("organization"):
+        logger.warning(f"No organization data found for {domain}")
+        return {
+            "domain": domain,
+            "error": "No organization data found",
+            "source": "apollo"
+        }
+
+    org = data["organization"]
+    result = {
+        "domain": domain,
+        "name": org.get("name", ""),
+        "website_url": org.get("website_url", ""),
+        "linkedin_url": org.get("linkedin_url", ""),
+        "founded_year": org.get("founded_year", ""),
+        "annual_revenue_printed": org.get("annual_revenue_printed", ""),
+        "employees_count": org.get("employees_count", ""),
+        "industry": org.get("industry", ""),
+        "location": org.get("location", ""),
+        "source": "apollo"
+    }
+
+    # Clean up empty values
+    result = {k: v for k, v in result.items() if v not in ["", None]}
+    logger.info(f"Successfully enriched data for {domain}")
+    return result
+
+@cached("apollo", domain_key)
+@single_flight("apollo", domain_key)
+@observe_source("apollo")
+def enrich_single_company(url_or_domain):
+    """Call Apollo API to enrich company data."""
+    domain, error = resolve_domain(url_or_domain)
+    if error:
+        return error
+
     params = {"domain": domain}
     
     try:
-        logger.info(f"Enriching data for domain: {domain}")
-        sleep(uniform(1, 2))  # Random delay between requests
+        logger.debug(f"Enriching data for domain: {domain}")
 
-        response = requests.get(url, headers=headers, params=params, timeout=15)
+        response = http_client.get(APOLLO_ENRICH_URL, headers=apollo_headers(), params=params, timeout=15)
         response.raise_for_status()
-        data = response.json()
-
-        if not data.get("organization"):
-            logger.warning(f"No organization data found for {domain}")
-            return {
-                "domain": domain,
-                "error": "No organization data found",
-                "source": "apollo"
-            }
-
-        org = data["organization"]
-        result = {
-            "domain": domain,
-            "name": org.get("name", ""),
-            "website_url": org.get("website_url", ""),
-            "linkedin_url": org.get("linkedin_url", ""),
-            "founded_year": org.get("founded_year", ""),
-            "annual_revenue_printed": org.get("annual_revenue_printed", ""),
-            "employees_count": org.get("employees_count", ""),
-            "industry": org.get("industry", ""),
-            "location": org.get("location", ""),
-            "source": "apollo"
-        }
+        return parse_organization(domain, response.json())
 
-        # Clean up empty values
-        result = {k: v for k, v in result.items() if v not in ["", None]}
-        logger.info(f"Successfully enriched data for {domain}")
-        return result
+    except httpx.TimeoutException:
+        logger.error(f"Timeout while enriching {domain}")
+        return {"domain": domain, "error": "Request timed out", "source": "apollo"}
+    except httpx.HTTPError as e:
+        logger.error(f"Request error for {domain}: {str(e)}")
+        return {"domain": domain, "error": str(e), "source": "apollo"}
+    except Exception as e:
+        logger.error(f"Unexpected error for {domain}: {str(e)}")
+        return {"domain": domain, "error": str(e), "source": "apollo"}
+
+@cached("apollo", domain_key)
+@single_flight("apollo", domain_key)
+@observe_source("apollo")
+async def enrich_single_company_async(url_or_domain):
+    """Non-blocking variant of enrich_single_company for the ASGI app."""
+    domain, error = resolve_domain(url_or_domain)
+    if error:
+        return error
+
+    params = {"domain": domain}
+
+    try:
+        logger.debug(f"Enriching data for domain: {domain}")
+
+        response = await http_client.aget(APOLLO_ENRICH_URL, headers=apollo_headers(), params=params, timeout=15)
+        response.raise_for_status()
+        return parse_organization(domain, response.json())
 
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         logger.error(f"Timeout while enriching {domain}")
         return {"domain": domain, "error": "Request timed out", "source": "apollo"}
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Request error for {domain}: {str(e)}")
         return {"domain": domain, "error": str(e), "source": "apollo"}
     except Exception as e:
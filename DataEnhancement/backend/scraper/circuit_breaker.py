@@ -0,0 +1,125 @@
+"""Per-provider circuit breakers for scraper HTTP calls.
+
+A breaker watches the last BREAKER_WINDOW calls to one provider (a rate
+limit bucket such as growjo.com or google.com). A call fails if it gets no
+response, gets a 429 or 5xx, or takes longer than BREAKER_SLOW_SECONDS.
+Once at least BREAKER_MIN_CALLS calls are recorded and BREAKER_FAILURE_RATE
+of them failed, the breaker opens and calls fail at once with
+CircuitOpenError instead of waiting out their timeouts. After
+BREAKER_OPEN_SECONDS one trial call is let through: success closes the
+breaker, failure opens it again.
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque
+import httpx
+from metrics import Counter, Gauge
+
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", 20))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", 10))
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", 0.5))
+BREAKER_SLOW_SECONDS = float(os.getenv("BREAKER_SLOW_SECONDS", 8))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", 30))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+logger = logging.getLogger(__name__)
+
+rejected_calls = Counter(
+    "leadgen_circuit_rejected_total", "Scraper requests failed fast by an open circuit breaker.", ["provider"]
+)
+
+
+class CircuitOpenError(httpx.RequestError):
+    """Raised instead of sending a request while the provider's breaker is open.
+
+    Being an httpx.HTTPError, it is handled like any other failed request.
+    """
+
+    def __init__(self, provider, retry_in):
+        super().__init__(f"Circuit open for {provider}, retry in {retry_in:.0f}s")
+        self.provider = provider
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker over a sliding window of call outcomes."""
+
+    def __init__(self, provider):
+        self.provider = provider
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=BREAKER_WINDOW)
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def check(self):
+        """Raise CircuitOpenError unless a call may be sent now."""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            retry_in = self._opened_at + BREAKER_OPEN_SECONDS - time.monotonic()
+            if self.state == OPEN and retry_in <= 0:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                logger.info(f"Circuit for {self.provider} half-open, sending a trial call")
+                return
+        rejected_calls.inc(self.provider)
+        raise CircuitOpenError(self.provider, max(retry_in, 0))
+
+    def record(self, failed):
+        """Record the outcome of a call let through by check(); None means it ended without one."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._trial_running = False
+                if failed is None:
+                    return
+                if failed:
+                    self._open()
+                else:
+                    logger.info(f"Circuit for {self.provider} closed")
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                return
+            if failed is None or self.state == OPEN:
+                return
+            self._outcomes.append(failed)
+            failures = sum(self._outcomes)
+            if len(self._outcomes) >= BREAKER_MIN_CALLS and failures >= BREAKER_FAILURE_RATE * len(self._outcomes):
+                self._open()
+
+    def _open(self):
+        logger.warning(f"Circuit for {self.provider} opened for {BREAKER_OPEN_SECONDS:.0f}s")
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker_for(provider):
+    with _breakers_lock:
+        breaker = _breakers.get(provider)
+        if breaker is None:
+            breaker = _breakers[provider] = CircuitBreaker(provider)
+        return breaker
+
+
+def _states():
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {(breaker.provider,): STATE_VALUES[breaker.state] for breaker in breakers}
+
+
+circuit_state = Gauge(
+    "leadgen_circuit_state", "Circuit breaker state per provider: 0 closed, 1 half-open, 2 open.", ["provider"],
+    collect=_states
+)
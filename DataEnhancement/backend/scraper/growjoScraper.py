@@ -11,6 +11,7 @@ from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, ElementClickInterceptedException,StaleElementReferenceException
+from metrics import observe_source, track_browser
 # Load environment variables
 load_dotenv()
 
@@ -20,12 +21,6 @@ GROWJO_SEARCH_URL = "https://growjo.com/"
 LOGIN_EMAIL = os.getenv("GROWJO_EMAIL")
 LOGIN_PASSWORD = os.getenv("GROWJO_PASSWORD")
 
-# For debugging
-print(f"Email: {LOGIN_EMAIL}")
-if LOGIN_PASSWORD:
-    print(f"Password: {LOGIN_PASSWORD[:3]}***** (first 3 chars shown for verification)")
-else:
-    print("Warning: GROWJO_PASSWORD not set in environment variables")
 
 class GrowjoScraper:
     """A class to scrape decision makers' information from Growjo.com."""
@@ -49,7 +44,7 @@ class GrowjoScraper:
         edge_options.add_argument("--window-size=1920,1080")
             
         # Using Edge WebDriver which is built into Windows 10
-        self.driver = webdriver.Edge(options=edge_options)
+        self.driver = track_browser(webdriver.Edge(options=edge_options), "edge")
         self.driver.maximize_window()
     
     def login(self):
@@ -575,6 +570,7 @@ class GrowjoScraper:
             print(f"Error getting decision makers: {str(e)}")
             return []
     
+    @observe_source("growjo_selenium")
     def scrape_company(self, company_name):
         """Search for a company and scrape its decision makers' information."""
         if not self.logged_in:
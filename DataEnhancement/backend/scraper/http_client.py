@@ -0,0 +1,232 @@
+"""Shared HTTP clients for the scrapers.
+
+One pooled client per process (and one per event loop for async callers)
+keeps connections alive per host instead of doing a TCP and TLS handshake
+on every call. HTTP/2 is used when the ``h2`` package is installed and the
+server supports it. Every request waits for its host's rate limit (see
+rate_limit), gets default timeouts and is retried with jittered exponential
+backoff on connection errors, 429 and 5xx responses. Read timeouts are not
+retried.
+
+Each attempt also passes its provider's circuit breaker (circuit_breaker),
+which fails it at once with CircuitOpenError while the provider is failing,
+and takes one of the provider's adaptive concurrency slots
+(adaptive_concurrency). Calls made for interactive work (see
+scheduler.current_priority) skip ahead of bulk ones in the rate and
+concurrency limits.
+
+    from scraper import http_client
+    response = http_client.get(url, params=..., headers=...)
+    response = await http_client.aget(url, params=..., headers=...)
+"""
+import os
+import time
+import random
+import atexit
+import asyncio
+import logging
+import threading
+import weakref
+from contextlib import contextmanager, asynccontextmanager
+from urllib.parse import urlparse
+import httpx
+from metrics import Counter
+from scraper import rate_limit
+from scraper.circuit_breaker import breaker_for, BREAKER_SLOW_SECONDS
+from scraper.adaptive_concurrency import limiter_for
+from scheduler import is_interactive
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 15))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", 3))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", 0.5))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", 30))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", 20))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Errors worth another attempt; anything else (e.g. an invalid URL) is raised at once
+RETRY_ERRORS = (httpx.TransportError,)
+# A server that was too slow once has just used up the caller's timeout; trying
+# again would make the caller wait HTTP_RETRIES more timeouts for one lookup
+NO_RETRY_ERRORS = (httpx.ReadTimeout,)
+
+try:
+    import h2  # noqa: F401
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+logger = logging.getLogger(__name__)
+
+retries = Counter("leadgen_http_retries_total", "Scraper HTTP requests retried, by host.", ["host"])
+
+_client = None
+_client_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _client_options():
+    return {
+        "timeout": httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        "limits": httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE),
+        "http2": HTTP2,
+        "follow_redirects": True,
+    }
+
+
+def client():
+    """The process-wide pooled client."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(**_client_options())
+                atexit.register(_client.close)
+    return _client
+
+
+def async_client():
+    """The pooled async client of the running event loop."""
+    loop = asyncio.get_running_loop()
+    pooled = _async_clients.get(loop)
+    if pooled is None:
+        pooled = _async_clients[loop] = httpx.AsyncClient(**_client_options())
+    return pooled
+
+
+def backoff(attempt, response=None):
+    """Seconds to wait before retry ``attempt`` (1-based): full jitter, or the server's Retry-After."""
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), HTTP_BACKOFF_MAX)
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * 2 ** attempt))
+
+
+def _host(url):
+    return urlparse(str(url)).hostname or ""
+
+
+class _Outcome:
+    """Whether one attempt failed: True, False, or None if it ended without a response or error."""
+    failed = None
+
+    def finish(self, response):
+        self.failed = response.status_code in RETRY_STATUSES
+
+
+def _settle(breaker, limiter, started, outcome):
+    failed = outcome.failed
+    slow = failed is False and time.monotonic() - started > BREAKER_SLOW_SECONDS
+    breaker.record(True if slow else failed)
+    limiter.release(started, failed)
+
+
+@contextmanager
+def _guard(url):
+    """Pass the breaker, rate limit and concurrency limit of ``url``'s provider for one attempt."""
+    host = _host(url)
+    provider = rate_limit.bucket_for(host)[0]
+    breaker, limiter = breaker_for(provider), limiter_for(provider)
+    breaker.check()
+    interactive = is_interactive()
+    try:
+        rate_limit.acquire(host, interactive)
+        started = limiter.acquire(interactive)
+    except BaseException:
+        breaker.record(None)
+        raise
+    outcome = _Outcome()
+    try:
+        yield outcome
+    except RETRY_ERRORS:
+        outcome.failed = True
+        raise
+    finally:
+        _settle(breaker, limiter, started, outcome)
+
+
+@asynccontextmanager
+async def _aguard(url):
+    """Async variant of _guard()."""
+    host = _host(url)
+    provider = rate_limit.bucket_for(host)[0]
+    breaker, limiter = breaker_for(provider), limiter_for(provider)
+    breaker.check()
+    interactive = is_interactive()
+    try:
+        await rate_limit.acquire_async(host, interactive)
+        started = await limiter.acquire_async(interactive)
+    except BaseException:
+        breaker.record(None)
+        raise
+    outcome = _Outcome()
+    try:
+        yield outcome
+    except RETRY_ERRORS:
+        outcome.failed = True
+        raise
+    finally:
+        _settle(breaker, limiter, started, outcome)
+
+
+def _should_retry(url, attempt, response=None, error=None):
+    if attempt > HTTP_RETRIES or isinstance(error, NO_RETRY_ERRORS):
+        return False
+    if response is not None and response.status_code not in RETRY_STATUSES:
+        return False
+    host = _host(url)
+    retries.inc(host)
+    reason = error or f"HTTP {response.status_code}"
+    logger.debug(f"Retrying {host} ({attempt}/{HTTP_RETRIES}) after {reason}")
+    return True
+
+
+def request(method, url, **kwargs):
+    """Send a request through the shared client, retrying transient failures.
+
+    Returns the last response, which may still be a 429 or 5xx once the
+    retries are used up; raises httpx.HTTPError if no response was received.
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            with _guard(url) as outcome:
+                response = client().request(method, url, **kwargs)
+                outcome.finish(response)
+        except RETRY_ERRORS as e:
+            if not _should_retry(url, attempt, error=e):
+                raise
+            time.sleep(backoff(attempt))
+            continue
+        if not _should_retry(url, attempt, response=response):
+            return response
+        time.sleep(backoff(attempt, response))
+
+
+async def arequest(method, url, **kwargs):
+    """Async variant of request()."""
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            async with _aguard(url) as outcome:
+                response = await async_client().request(method, url, **kwargs)
+                outcome.finish(response)
+        except RETRY_ERRORS as e:
+            if not _should_retry(url, attempt, error=e):
+                raise
+            await asyncio.sleep(backoff(attempt))
+            continue
+        if not _should_retry(url, attempt, response=response):
+            return response
+        await asyncio.sleep(backoff(attempt, response))
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+async def aget(url, **kwargs):
+    return await arequest("GET", url, **kwargs)
@@ -1,6 +1,8 @@
 import os
+import uuid
 import shutil
 import logging
+import argparse
 import pandas as pd
 import random
 import time
@@ -11,6 +13,8 @@ from .scraping.login import login_to_linkedin
 from .scraping.scraper import scrape_linkedin
 from .utils.fileUtils import read_csv
 from .utils.proxyUtils import generate_smartproxy_url
+from logging_config import configure_logging
+from results_store import results_store
 
 # === Environment and Configs ===
 load_dotenv()
@@ -30,12 +34,8 @@ def get_next_log_filename(log_dir="log", base_name="log"):
         i += 1
     return f"{log_dir}/{base_name}_{i}.log"
 
-log_file = get_next_log_filename()
-logging.basicConfig(
-    filename=log_file,
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
+def setup_logging():
+    configure_logging(log_file=get_next_log_filename())
 
 
 def get_next_output_filename(base):
@@ -44,14 +44,16 @@ def get_next_output_filename(base):
         i += 1
     return f"{base}{i}.csv"
 
-CSV_OUTPUT = get_next_output_filename(CSV_OUTPUT_BASE)
 
-
-def run_batches(df, client_id):
+def run_batches(df, client_id, on_result=None, should_stop=None, on_driver=None):
     results = []
     total_batches = (len(df) + BATCH_SIZE - 1) // BATCH_SIZE
 
     for batch_index, i in enumerate(range(0, len(df), BATCH_SIZE)):
+        if should_stop and should_stop():
+            logging.info("🛑 Stop requested, not starting further batches")
+            break
+
         batch = df.iloc[i:i + BATCH_SIZE]
         logging.info(f"🚀 Starting batch {batch_index + 1}/{total_batches}")
 
@@ -60,6 +62,8 @@ def run_batches(df, client_id):
             headless=False,
             proxy_url=proxy_url
         )
+        if on_driver:
+            on_driver(driver)
 
         # Save unique profile info for debug/tracking (optional)
         save_chrome_info(port=9222 + batch_index, user_data_dir=f"profile_{client_id}_batch{batch_index+1}")
@@ -69,9 +73,16 @@ def run_batches(df, client_id):
         try:
             if not login_to_linkedin(driver, USERNAME, PASSWORD):
                 logging.error("❌ Login failed. Skipping batch.")
+                for company in batch.get("Company", []):
+                    result = {"Business Name": company, "Error": "LinkedIn login failed"}
+                    results.append(result)
+                    if on_result:
+                        on_result(result)
                 continue
 
             for _, row in tqdm(batch.iterrows(), total=len(batch), desc=f"🔄 Batch {batch_index + 1}/{total_batches}", leave=False, position=1):
+                if should_stop and should_stop():
+                    break
                 company = row.get("Company", "UNKNOWN")
                 try:
                     result = scrape_linkedin(
@@ -83,11 +94,17 @@ def run_batches(df, client_id):
                         logged_in=True
                     )
                     result["Business Name"] = company
-                    results.append(result)
                     logging.info(f"✅ Scraped: {company}")
                 except Exception as e:
+                    if should_stop and should_stop():
+                        # The driver was quit under us by a cancel; not a real failure
+                        break
                     logging.error(f"❌ Error in {company}: {e}")
-                    results.append({"Business Name": company, "Error": str(e)})
+                    result = {"Business Name": company, "Error": str(e)}
+
+                results.append(result)
+                if on_result:
+                    on_result(result)
 
         finally:
             try:
@@ -98,7 +115,7 @@ def run_batches(df, client_id):
                 shutil.rmtree(user_data_dir, ignore_errors=True)
                 logging.debug(f"🧹 Cleaned profile: {user_data_dir}")
 
-        if batch_index < total_batches - 1:
+        if batch_index < total_batches - 1 and not (should_stop and should_stop()):
             sleep_time = random.uniform(*WAIT_BETWEEN_BATCHES)
             logging.info(f"⏱️ Waiting {sleep_time:.2f}s before next batch")
             time.sleep(sleep_time)
@@ -107,16 +124,49 @@ def run_batches(df, client_id):
 
 
 def main():
-    if not os.path.exists(CSV_INPUT):
-        logging.error(f"CSV file not found: {CSV_INPUT}")
+    parser = argparse.ArgumentParser(description="Scrape LinkedIn company pages for the companies in a CSV")
+    parser.add_argument("--resume", metavar="RUN_ID", help="continue an interrupted run, skipping rows it already scraped")
+    args = parser.parse_args()
+
+    # Log files and output names are only claimed when run as a script,
+    # never when imported by the API
+    setup_logging()
+    csv_output = get_next_output_filename(CSV_OUTPUT_BASE)
+
+    csv_input = CSV_INPUT
+    if args.resume:
+        record = results_store.get_job(args.resume)
+        if record is None:
+            logging.error(f"No run {args.resume} to resume")
+            return
+        csv_input = record["params"]["args"][0]
+
+    if not os.path.exists(csv_input):
+        logging.error(f"CSV file not found: {csv_input}")
         return
 
-    df = read_csv(CSV_INPUT)
+    df = read_csv(csv_input)
     if df.empty or "Company" not in df.columns:
         logging.error("CSV is empty or missing 'Company' column.")
         return
 
-    all_results = run_batches(df, client_id=CLIENT_ID)
+    # Every scraped row is stored right away, so a crash only loses the row in progress
+    run_id = args.resume or f"cli_{uuid.uuid4().hex[:12]}"
+    if not args.resume:
+        results_store.save_job(
+            run_id, "linkedin_cli", None, len(df), {"args": [csv_input], "kwargs": {}}, "running", time.time()
+        )
+    next_index, _ = results_store.progress(run_id)
+    logging.info(f"Run {run_id}: {next_index}/{len(df)} rows already scraped. Resume with --resume {run_id}")
+
+    def checkpoint(result):
+        nonlocal next_index
+        results_store.append(run_id, next_index, [result])
+        next_index += 1
+
+    run_batches(df.iloc[next_index:], client_id=CLIENT_ID, on_result=checkpoint)
+    results_store.set_job_status(run_id, "completed")
+    all_results = list(results_store.iter_rows(run_id))
 
     if all_results:
         df_results = pd.DataFrame(all_results)
@@ -125,8 +175,8 @@ def main():
             cols = ["Business Name"] + [col for col in df_results.columns if col != "Business Name"]
             df_results = df_results[cols]
 
-        df_results.to_csv(CSV_OUTPUT, index=False)
-        logging.info(f"💾 Final save: {len(all_results)} rows → {CSV_OUTPUT}")
+        df_results.to_csv(csv_output, index=False)
+        logging.info(f"💾 Final save: {len(all_results)} rows → {csv_output}")
 
     logging.info("✅ Finished scraping.")
 
@@ -15,7 +15,6 @@ from selenium_stealth import stealth  # 🥷 Stealth added here
 ENV_PATH = os.path.abspath(".env")
 
 load_dotenv()
-logging.basicConfig(level=logging.INFO)
 
 USERNAME = os.getenv("LINKEDIN_USERNAME") or "leadgenraf2@gmail.com"
 PASSWORD = os.getenv("LINKEDIN_PASSWORD") or "123Testing90."
@@ -128,4 +127,6 @@ def scrape_and_save_li_at():
         driver.quit()
 
 if __name__ == "__main__":
+    from logging_config import configure_logging
+    configure_logging()
     scrape_and_save_li_at()
\ No newline at end of file
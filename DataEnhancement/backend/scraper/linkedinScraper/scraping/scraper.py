@@ -16,6 +16,7 @@ from .login import login_to_linkedin
 from ..utils.chromeUtils import get_chrome_driver
 from ..utils.proxyUtils import generate_smartproxy_url
 from dotenv import load_dotenv
+from metrics import observe_source
 
 load_dotenv()
 USERNAME = os.getenv("LINKEDIN_USERNAME") or "leadgenraf2@gmail.com"
@@ -52,6 +53,7 @@ def wait_for_page_load(driver, timeout=3):
         logging.debug("Page load wait timed out.")
     time.sleep(random.uniform(0.5, 1.0))
 
+@observe_source("linkedin_selenium")
 def scrape_linkedin(driver, business_name, expected_city=None, expected_state=None, expected_website=None, logged_in=False):
     try:
         if not logged_in:
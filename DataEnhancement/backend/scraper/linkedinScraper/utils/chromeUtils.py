@@ -11,6 +11,7 @@ from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import WebDriverException
 from selenium_stealth import stealth
 from ..utils.proxyUtils import format_proxy_for_chrome
+from metrics import track_browser
 
 
 # Configurable constants
@@ -24,9 +25,6 @@ SMARTPROXY_GATEWAY = os.getenv("SMARTPROXY_GATEWAY", "us.smartproxy.com")
 SMARTPROXY_PORT = int(os.getenv("SMARTPROXY_PORT", 10001))
 
 
-# Ensure debug folder exists
-DEBUG_FOLDER.mkdir(exist_ok=True)
-
 def is_port_available(port):
     try:
         s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -47,6 +45,7 @@ def save_chrome_info(port, user_data_dir):
         'port': port,
         'user_data_dir': str(user_data_dir)
     }
+    DEBUG_FOLDER.mkdir(parents=True, exist_ok=True)
     with open(CHROME_INFO_FILE, 'w') as f:
         json.dump(chrome_info, f)
     logging.info(f"Chrome debugging info saved to {CHROME_INFO_FILE}")
@@ -132,7 +131,7 @@ def get_chrome_driver(headless=False, max_retries=3, proxy_url=None):
 
             driver.implicitly_wait(10)
             save_chrome_info(port, "linkedin_profile_dummy")
-            return driver
+            return track_browser(driver, "chrome")
 
         except WebDriverException as e:
             logging.error(f"Chrome launch failed (Attempt {attempt + 1}): {e}")
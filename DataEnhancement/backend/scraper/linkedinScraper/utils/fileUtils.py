@@ -5,8 +5,8 @@ import re
 from pathlib import Path
 
 # Define debug folder using pathlib
+# Created on first write, so importing this module touches no files
 DEBUG_FOLDER = Path.cwd() / "debug"
-DEBUG_FOLDER.mkdir(exist_ok=True)
 
 INDUSTRY_MAPPINGS_FILE = DEBUG_FOLDER / 'industry_mappings.json'
 
@@ -22,6 +22,7 @@ def read_csv(file_path):
 
 def save_screenshot(driver, filename):
     """Save a screenshot to the debug folder."""
+    DEBUG_FOLDER.mkdir(exist_ok=True)
     filepath = DEBUG_FOLDER / filename
     driver.save_screenshot(str(filepath))
     logging.info(f"Screenshot saved to {filepath}")
@@ -29,6 +30,7 @@ def save_screenshot(driver, filename):
 
 def save_page_source(driver, filename):
     """Save the current page source to the debug folder."""
+    DEBUG_FOLDER.mkdir(exist_ok=True)
     filepath = DEBUG_FOLDER / filename
     with open(filepath, "w", encoding="utf-8") as f:
         f.write(driver.page_source)
@@ -67,6 +69,7 @@ def load_industry_mappings():
 def save_industry_mappings(mappings: dict):
     """Save industry code-to-name mappings to JSON file."""
     try:
+        DEBUG_FOLDER.mkdir(exist_ok=True)
         with open(INDUSTRY_MAPPINGS_FILE, 'w') as f:
             json.dump(mappings, f, indent=2, sort_keys=True)
         logging.info(f"Saved {len(mappings)} industry mappings to {INDUSTRY_MAPPINGS_FILE}")
@@ -0,0 +1,207 @@
+"""Per-host token-bucket rate limits for scraper HTTP calls.
+
+Every request made through ``http_client`` first takes a token for its
+host. A bucket refills at ``rate`` tokens per second up to ``burst``;
+callers that find it empty are given the next free slot and sleep until
+then, so concurrent callers together never exceed the rate.
+
+INTERACTIVE_RATE_SHARE of each host's rate is kept in a bucket of its own
+for interactive calls, so an analyst's lookup never waits behind the tokens
+a bulk upload has already reserved. Bulk calls get the rest, plus the
+interactive bucket's spare token whenever that bucket is full (idle), so
+bulk work still uses the whole rate when nobody is waiting. Likewise an
+interactive call whose bucket is empty takes any bulk token nobody has
+reserved.
+
+Buckets live in this process by default. Set RATE_LIMIT_DB to a SQLite file
+shared by the API and worker processes to hold all of them to one budget
+per host. Like the task queue, it must be on a local disk, so those
+processes all run on one machine; SQLite's WAL mode does not work on
+network filesystems.
+
+Limits are "host=rate[/burst]" pairs, e.g.
+HOST_RATE_LIMITS="growjo.com=0.5/1,api.apollo.io=2". A host's subdomains
+share its bucket unless they have their own. Other hosts get
+HTTP_RATE_LIMIT/HTTP_RATE_BURST.
+"""
+import os
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+from metrics import Histogram
+
+HTTP_RATE_LIMIT = float(os.getenv("HTTP_RATE_LIMIT", 1))
+HTTP_RATE_BURST = float(os.getenv("HTTP_RATE_BURST", 2))
+RATE_LIMIT_DB = os.getenv("RATE_LIMIT_DB")
+# Share of each host's rate kept for interactive calls (0 turns priorities off)
+INTERACTIVE_RATE_SHARE = min(max(float(os.getenv("INTERACTIVE_RATE_SHARE", 0.2)), 0), 0.9)
+# Bulk calls only borrow from the interactive bucket while it is this full,
+# so at least one token is always left for the next interactive call
+INTERACTIVE_BURST = 2
+
+# Requests per second and burst for the providers we scrape
+DEFAULT_HOST_LIMITS = {
+    "google.com": (1, 2),
+    "brave.com": (1, 2),
+    "growjo.com": (1, 2),
+    "api.apollo.io": (1, 1),
+    "api.hunter.io": (0.5, 1),
+}
+
+logger = logging.getLogger(__name__)
+
+wait_seconds = Histogram(
+    "leadgen_rate_limit_wait_seconds", "Time scraper requests waited for their host's rate limit.",
+    ["host", "priority"],
+    buckets=(0, 0.1, 0.5, 1, 2, 5, 10, 30, 60)
+)
+
+
+def parse_limits(spec):
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        host, _, value = item.partition("=")
+        rate, _, burst = value.partition("/")
+        try:
+            limits[host.strip().lower()] = (float(rate), float(burst or 1))
+        except ValueError:
+            logger.warning(f"Ignoring invalid host rate limit: {item}")
+    return limits
+
+
+HOST_LIMITS = {**DEFAULT_HOST_LIMITS, **parse_limits(os.getenv("HOST_RATE_LIMITS", ""))}
+
+
+def bucket_for(host):
+    """(bucket name, rate, burst) for ``host``: its own limit, its closest parent domain's, or the default."""
+    host = (host or "").lower()
+    parts = host.split(".")
+    for i in range(len(parts) - 1):
+        name = ".".join(parts[i:])
+        if name in HOST_LIMITS:
+            return (name, *HOST_LIMITS[name])
+    return host, HTTP_RATE_LIMIT, HTTP_RATE_BURST
+
+
+def _refill(states, key, rate, burst, now):
+    tokens, updated = states.get(key, (burst, now))
+    return min(burst, tokens + max(now - updated, 0) * rate)
+
+
+def reserve_token(states, name, rate, burst, interactive, now):
+    """Take a token for one request and return how long to wait before using it.
+
+    ``states`` maps bucket keys to (tokens, updated) and is updated in place;
+    tokens below zero are reservations of callers still waiting.
+    """
+    share = rate * INTERACTIVE_RATE_SHARE
+    if share <= 0:
+        tokens = _refill(states, name, rate, burst, now) - 1
+        states[name] = (tokens, now)
+        return -tokens / rate if tokens < 0 else 0.0
+
+    lane_key = f"{name}|interactive"
+    lane = _refill(states, lane_key, share, INTERACTIVE_BURST, now)
+    bulk = _refill(states, name, rate - share, burst, now)
+    if interactive and lane < 1 <= bulk:
+        # An unreserved bulk token is free to take
+        bulk -= 1
+        tokens, refill_rate = bulk, rate - share
+    elif interactive or lane >= INTERACTIVE_BURST:
+        lane -= 1
+        tokens, refill_rate = lane, share
+    else:
+        bulk -= 1
+        tokens, refill_rate = bulk, rate - share
+    states[lane_key] = (lane, now)
+    states[name] = (bulk, now)
+    return -tokens / refill_rate if tokens < 0 else 0.0
+
+
+class LocalBuckets:
+    """Token buckets shared by the threads of this process."""
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, name, rate, burst, interactive):
+        with self._lock:
+            return reserve_token(self._states, name, rate, burst, interactive, time.monotonic())
+
+
+class SharedBuckets:
+    """Token buckets in a SQLite file shared between the processes of one machine."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def reserve(self, name, rate, burst, interactive):
+        now = time.time()
+        keys = (name, f"{name}|interactive")
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            states = {
+                row[0]: (row[1], row[2])
+                for row in conn.execute("SELECT name, tokens, updated FROM buckets WHERE name IN (?, ?)", keys)
+            }
+            delay = reserve_token(states, name, rate, burst, interactive, now)
+            conn.executemany(
+                "INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                [(key, *state) for key, state in states.items()]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return delay
+
+
+_buckets = SharedBuckets(RATE_LIMIT_DB) if RATE_LIMIT_DB else LocalBuckets()
+
+
+def _reserve(host, interactive):
+    name, rate, burst = bucket_for(host)
+    if rate <= 0:
+        return 0.0
+    try:
+        delay = _buckets.reserve(name, rate, burst, interactive)
+    except sqlite3.Error as e:
+        # Better to go on unthrottled for a moment than to fail the lookup
+        logger.warning(f"Rate limit store unavailable for {name}: {e}")
+        delay = 0.0
+    wait_seconds.observe(delay, name, "interactive" if interactive else "bulk")
+    return delay
+
+
+def acquire(host, interactive=False):
+    """Block until a request to ``host`` is allowed."""
+    delay = _reserve(host, interactive)
+    if delay:
+        time.sleep(delay)
+
+
+async def acquire_async(host, interactive=False):
+    """Async variant of acquire()."""
+    if isinstance(_buckets, SharedBuckets):
+        delay = await asyncio.to_thread(_reserve, host, interactive)
+    else:
+        delay = _reserve(host, interactive)
+    if delay:
+        await asyncio.sleep(delay)
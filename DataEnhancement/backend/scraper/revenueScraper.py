@@ -1,10 +1,12 @@
-import requests
+import httpx
 from bs4 import BeautifulSoup
 from urllib.parse import quote
 import re
 import logging
-from time import sleep
-from random import uniform
+from metrics import observe_source
+from scraper import http_client
+from singleflight import single_flight, company_key
+from cache import cached
 
 logger = logging.getLogger(__name__)
 
@@ -30,92 +32,113 @@ def clean_company_name_variants(name):
 
     return list(dict.fromkeys(variants))
 
+BASE_URL = "https://growjo.com/company/"
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.5",
+    "Connection": "keep-alive"
+}
+
+def parse_revenue_page(html, company_name, name_variant, company_url):
+    """Extract the revenue result from a Growjo company page, or None if it isn't a match."""
+    soup = BeautifulSoup(html, "html.parser")
+
+    page_text = soup.get_text().lower()
+
+    if (
+        "page not found" in page_text or 
+        "company not found" in page_text or 
+        "rank not available" in page_text
+    ):
+        logger.debug(f"No match found for variant: {name_variant}")
+        return None
+
+    # Look for revenue in multiple places
+    revenue = "<$5M"  # Default value
+    revenue_patterns = [
+        r"estimated annual revenue[:\s]*([\$\d\.]+[KMB]?)",
+        r"revenue[:\s]*([\$\d\.]+[KMB]?)",
+        r"([\$\d\.]+[KMB]?)[\s]*annual revenue"
+    ]
+
+    # Try to find revenue in list items first
+    for li in soup.find_all("li"):
+        text = li.get_text(strip=True)
+        if "revenue" in text.lower():
+            for pattern in revenue_patterns:
+                match = re.search(pattern, text, re.IGNORECASE)
+                if match:
+                    revenue = match.group(1)
+                    break
+            if revenue != "<$5M":
+                break
+
+    # If not found in list items, try other elements
+    if revenue == "<$5M":
+        for pattern in revenue_patterns:
+            matches = re.findall(pattern, page_text, re.IGNORECASE)
+            if matches:
+                revenue = matches[0]
+                break
+
+    # Normalize revenue format
+    revenue = revenue.upper().replace(" ", "")
+    if not revenue.startswith("$"):
+        revenue = "$" + revenue
+
+    result = {
+        "company": company_name,
+        "matched_variant": name_variant,
+        "estimated_revenue": revenue,
+        "url": company_url,
+        "source": "growjo"
+    }
+
+    logger.info(f"Found revenue for {company_name}: {result}")
+    return result
+
+def invalid_company_result(company_name):
+    return {
+        "company": company_name,
+        "error": "Invalid company name"
+    }
+
+def fallback_result(company_name, name_variants):
+    logger.warning(f"No revenue found for {company_name}, using fallback value")
+    return {
+        "company": company_name,
+        "source": "fallback",
+        "estimated_revenue": "<$5M",
+        "attempted_variants": name_variants
+    }
+
+@cached("growjo_http", company_key)
+@single_flight("growjo_http", company_key)
+@observe_source("growjo_http")
 def get_company_revenue_from_growjo(company_name, depth=0):
     if not company_name or len(company_name.strip()) == 0:
-        return {
-            "company": company_name,
-            "error": "Invalid company name"
-        }
-
-    base_url = "https://growjo.com/company/"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-        "Accept-Language": "en-US,en;q=0.5",
-        "Connection": "keep-alive"
-    }
+        return invalid_company_result(company_name)
 
     name_variants = clean_company_name_variants(company_name)
-    logger.info(f"Searching revenue for {company_name} with variants: {name_variants}")
+    logger.debug(f"Searching revenue for {company_name} with variants: {name_variants}")
 
     for name_variant in name_variants:
         try:
-            sleep(uniform(1, 2))  # Random delay between requests
-            company_url = base_url + quote(name_variant)
-            logger.info(f"Trying URL: {company_url}")
+            company_url = BASE_URL + quote(name_variant)
+            logger.debug(f"Trying URL: {company_url}")
 
-            res = requests.get(company_url, headers=headers, timeout=15)
+            res = http_client.get(company_url, headers=HEADERS, timeout=15)
             res.raise_for_status()
-            soup = BeautifulSoup(res.text, "html.parser")
-
-            page_text = soup.get_text().lower()
-
-            if (
-                "page not found" in page_text or 
-                "company not found" in page_text or 
-                "rank not available" in page_text
-            ):
-                logger.info(f"No match found for variant: {name_variant}")
-                continue
-
-            # Look for revenue in multiple places
-            revenue = "<$5M"  # Default value
-            revenue_patterns = [
-                r"estimated annual revenue[:\s]*([\$\d\.]+[KMB]?)",
-                r"revenue[:\s]*([\$\d\.]+[KMB]?)",
-                r"([\$\d\.]+[KMB]?)[\s]*annual revenue"
-            ]
-
-            # Try to find revenue in list items first
-            for li in soup.find_all("li"):
-                text = li.get_text(strip=True)
-                if "revenue" in text.lower():
-                    for pattern in revenue_patterns:
-                        match = re.search(pattern, text, re.IGNORECASE)
-                        if match:
-                            revenue = match.group(1)
-                            break
-                    if revenue != "<$5M":
-                        break
-
-            # If not found in list items, try other elements
-            if revenue == "<$5M":
-                for pattern in revenue_patterns:
-                    matches = re.findall(pattern, page_text, re.IGNORECASE)
-                    if matches:
-                        revenue = matches[0]
-                        break
-
-            # Normalize revenue format
-            revenue = revenue.upper().replace(" ", "")
-            if not revenue.startswith("$"):
-                revenue = "$" + revenue
-
-            result = {
-                "company": company_name,
-                "matched_variant": name_variant,
-                "estimated_revenue": revenue,
-                "url": company_url,
-                "source": "growjo"
-            }
-
-            logger.info(f"Found revenue for {company_name}: {result}")
-            return result
-
-        except requests.exceptions.Timeout:
+
+            result = parse_revenue_page(res.text, company_name, name_variant, company_url)
+            if result:
+                return result
+
+        except httpx.TimeoutException:
             logger.error(f"Timeout while fetching {company_url}")
             continue
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Request error for {company_url}: {str(e)}")
             continue
         except Exception as e:
@@ -123,13 +146,43 @@ def get_company_revenue_from_growjo(company_name, depth=0):
             continue
 
     # Fallback to default value
-    logger.warning(f"No revenue found for {company_name}, using fallback value")
-    return {
-        "company": company_name,
-        "source": "fallback",
-        "estimated_revenue": "<$5M",
-        "attempted_variants": name_variants
-    }
+    return fallback_result(company_name, name_variants)
+
+@cached("growjo_http", company_key)
+@single_flight("growjo_http", company_key)
+@observe_source("growjo_http")
+async def get_company_revenue_from_growjo_async(company_name):
+    """Non-blocking variant of get_company_revenue_from_growjo for the ASGI app."""
+    if not company_name or len(company_name.strip()) == 0:
+        return invalid_company_result(company_name)
+
+    name_variants = clean_company_name_variants(company_name)
+    logger.debug(f"Searching revenue for {company_name} with variants: {name_variants}")
+
+    for name_variant in name_variants:
+        company_url = BASE_URL + quote(name_variant)
+        try:
+            logger.debug(f"Trying URL: {company_url}")
+
+            res = await http_client.aget(company_url, headers=HEADERS, timeout=15)
+            res.raise_for_status()
+
+            result = parse_revenue_page(res.text, company_name, name_variant, company_url)
+            if result:
+                return result
+
+        except httpx.TimeoutException:
+            logger.error(f"Timeout while fetching {company_url}")
+            continue
+        except httpx.HTTPError as e:
+            logger.error(f"Request error for {company_url}: {str(e)}")
+            continue
+        except Exception as e:
+            logger.error(f"Unexpected error for {company_url}: {str(e)}")
+            continue
+
+    # Fallback to default value
+    return fallback_result(company_name, name_variants)
 
 # Example test
 if __name__ == "__main__":
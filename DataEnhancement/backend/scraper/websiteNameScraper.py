@@ -1,9 +1,11 @@
-import requests
+import httpx
 from bs4 import BeautifulSoup
 from urllib.parse import quote, urlparse
 import logging
-from time import sleep
-from random import uniform
+from metrics import observe_source
+from scraper import http_client
+from singleflight import single_flight, company_key
+from cache import cached
 
 logger = logging.getLogger(__name__)
 
@@ -13,11 +15,15 @@ def normalize_url(url):
     parsed = urlparse(url)
     return parsed.netloc.lower().replace("www.", "").strip("/")
 
-def find_company_website(company_name):
-    if not company_name or len(company_name.strip()) == 0:
-        return None
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Connection': 'keep-alive',
+}
 
-    search_engines = [
+def get_search_engines(company_name):
+    return [
         {
             'url': 'https://www.google.com/search',
             'params': {'q': f"{company_name} official website"},
@@ -32,47 +38,86 @@ def find_company_website(company_name):
         }
     ]
 
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.5',
-        'Connection': 'keep-alive',
-    }
-
+def pick_website(html, engine, company_name):
+    """Return the first search result that looks like the company's own site."""
     company_terms = company_name.lower().split()
+    soup = BeautifulSoup(html, 'html.parser')
+    result_links = soup.select(engine['selector'])
+
+    for link in result_links[:5]:  # Check only top 5 results
+        href = link.get('href', '').lower()
+        if not href or any(x in href for x in ['wikipedia.org', 'linkedin.com', 'facebook.com', 'twitter.com']):
+            continue
+
+        # Clean the URL
+        href = href.split('?')[0].strip('/')
+        if not href.startswith('http'):
+            continue
 
-    for engine in search_engines:
+        # Score the URL based on company name match
+        score = sum(1 for term in company_terms if term in href)
+        if score >= len(company_terms) * 0.5:  # At least 50% of company name terms should match
+            return href
+
+    return None
+
+@cached("website_search", company_key)
+@single_flight("website_search", company_key)
+@observe_source("website_search")
+def find_company_website(company_name):
+    if not company_name or len(company_name.strip()) == 0:
+        return None
+
+    for engine in get_search_engines(company_name):
         try:
-            logger.info(f"Trying {engine['domain']} for {company_name}")
-            sleep(uniform(1, 2))  # Random delay between requests
+            logger.debug(f"Trying {engine['domain']} for {company_name}")
 
-            response = requests.get(
+            response = http_client.get(
                 engine['url'],
                 params=engine['params'],
-                headers=headers,
+                headers=HEADERS,
                 timeout=10
             )
             response.raise_for_status()
 
-            soup = BeautifulSoup(response.text, 'html.parser')
-            result_links = soup.select(engine['selector'])
+            website = pick_website(response.text, engine, company_name)
+            if website:
+                return website
+
+        except httpx.HTTPError as e:
+            logger.error(f"Error searching {engine['domain']} for {company_name}: {str(e)}")
+            continue
+        except Exception as e:
+            logger.error(f"Unexpected error searching {engine['domain']} for {company_name}: {str(e)}")
+            continue
+
+    return None
+
+@cached("website_search", company_key)
+@single_flight("website_search", company_key)
+@observe_source("website_search")
+async def find_company_website_async(company_name):
+    """Non-blocking variant of find_company_website for the ASGI app."""
+    if not company_name or len(company_name.strip()) == 0:
+        return None
 
-            for link in result_links[:5]:  # Check only top 5 results
-                href = link.get('href', '').lower()
-                if not href or any(x in href for x in ['wikipedia.org', 'linkedin.com', 'facebook.com', 'twitter.com']):
-                    continue
+    for engine in get_search_engines(company_name):
+        try:
+            logger.debug(f"Trying {engine['domain']} for {company_name}")
 
-                # Clean the URL
-                href = href.split('?')[0].strip('/')
-                if not href.startswith('http'):
-                    continue
+            response = await http_client.aget(
+                engine['url'],
+                params=engine['params'],
+                headers=HEADERS,
+                timeout=10
+            )
+            response.raise_for_status()
 
-                # Score the URL based on company name match
-                score = sum(1 for term in company_terms if term in href)
-                if score >= len(company_terms) * 0.5:  # At least 50% of company name terms should match
-                    return href
+            website = pick_website(response.text, engine, company_name)
+            if website:
+                return website
 
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error searching {engine['domain']} for {company_name}: {str(e)}")
             continue
         except Exception as e:
@@ -2,9 +2,12 @@ import os
 import jwt
 import time
 import logging
+import threading
+from collections import OrderedDict
 from functools import wraps
-from flask import request, jsonify
+from flask import request, jsonify, g, make_response
 from dotenv import load_dotenv
+from metrics import cache_requests
 
 # Load environment variables
 load_dotenv()
@@ -12,6 +15,9 @@ JWT_SECRET = os.getenv('JWT_SECRET', 'fallback_secret_change_me_in_production')
 JWT_ALGORITHM = os.getenv('JWT_ALGORITHM', 'HS256')
 TOKEN_EXPIRATION = 3600  # 1 hour in seconds
 REFRESH_THRESHOLD = 300  # 5 minutes before expiration
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 1024))
+# Response header carrying a refreshed token
+REFRESH_HEADER = 'X-Refreshed-Token'
 
 VALID_USERS = {
     "admin@leadgen.com": "caprae@123",
@@ -20,6 +26,9 @@ VALID_USERS = {
 
 logger = logging.getLogger(__name__)
 
+_token_cache = OrderedDict()
+_token_cache_lock = threading.Lock()
+
 def generate_token(email):
     payload = {
         "email": email,
@@ -31,59 +40,71 @@ def generate_token(email):
         token = token.decode('utf-8')
     return token
 
-def validate_token(token):
+def verify_token(token):
+    """Return the decoded payload of a valid token, or None.
+
+    Verified tokens are kept in a bounded LRU until they expire, so repeat
+    requests skip the signature check.
+    """
+    now = time.time()
+    with _token_cache_lock:
+        decoded = _token_cache.get(token)
+        if decoded is not None:
+            if decoded['exp'] > now:
+                _token_cache.move_to_end(token)
+                cache_requests.inc("token", "hit")
+                return decoded
+            del _token_cache[token]
+    cache_requests.inc("token", "miss")
+
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        return payload.get('email')
+        decoded = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
     except jwt.ExpiredSignatureError:
         logger.error("Token expired")
         return None
     except jwt.InvalidTokenError:
         logger.error("Invalid token")
         return None
-
-def verify_token(token):
-    try:
-        decoded = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        current_time = time.time()
-        
-        if decoded['exp'] < current_time:
-            return None
-            
-        # Check if token needs refresh (within 5 minutes of expiration)
-        if decoded['exp'] - current_time < REFRESH_THRESHOLD:
-            new_token = generate_token(decoded['email'])
-            return {'decoded': decoded, 'new_token': new_token}
-            
-        return {'decoded': decoded}
-    except Exception as e:
-        print(f"Token verification failed: {e}")
+    if 'email' not in decoded or 'exp' not in decoded:
+        logger.error("Token missing email or expiry")
         return None
 
+    with _token_cache_lock:
+        _token_cache[token] = decoded
+        if len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return decoded
+
+def validate_token(token):
+    decoded = verify_token(token)
+    return decoded['email'] if decoded else None
+
+def refreshed_token(decoded):
+    """A fresh token when ``decoded`` is within REFRESH_THRESHOLD of expiring, else None."""
+    if decoded['exp'] - time.time() < REFRESH_THRESHOLD:
+        return generate_token(decoded['email'])
+    return None
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
         token = request.headers.get('Authorization')
         if not token or not token.startswith('Bearer '):
             return jsonify({"error": "Authorization header missing or invalid"}), 401
-            
-        result = validate_token(token.split(" ")[1])
-        if not result:
+
+        decoded = verify_token(token.split(" ")[1])
+        if not decoded:
             return jsonify({"error": "Invalid or expired token"}), 401
-            
-        # Add refreshed token to response if available
+        g.current_user = decoded['email']
+
         response = f(*args, **kwargs)
-        if isinstance(response, tuple):
-            response_data, status_code = response
-        else:
-            response_data, status_code = response, 200
-            
-        if 'new_token' in result:
-            if isinstance(response_data, dict):
-                response_data['new_token'] = result['new_token']
-            else:
-                response_data = {'data': response_data, 'new_token': result['new_token']}
-                
-        return jsonify(response_data), status_code
-            
-    return decorated
\ No newline at end of file
+
+        # Sliding refresh: hand out a new token near expiry without touching the body,
+        # so streamed responses pass through unbuffered
+        new_token = refreshed_token(decoded)
+        if new_token:
+            response = make_response(response)
+            response.headers[REFRESH_HEADER] = new_token
+        return response
+
+    return decorated
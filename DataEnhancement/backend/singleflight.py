@@ -0,0 +1,132 @@
+"""Single-flight coalescing of identical in-flight lookups.
+
+While a lookup for a key is running, further calls for the same source and
+key wait for it and share its result instead of hitting the site again.
+Nothing is kept once the call returns; this is not a cache.
+
+An interactive caller that joins a bulk call promotes it: the call's
+requests from then on run as interactive work (see scheduler.is_interactive).
+A request already waiting for its rate limit or concurrency slot keeps its
+place in the bulk queue.
+"""
+import copy
+import asyncio
+import threading
+from functools import wraps
+from urllib.parse import urlparse
+from concurrent.futures import Future
+from metrics import Counter
+from scheduler import SharedLane, shared_lane, is_interactive
+
+coalesced_calls = Counter(
+    "leadgen_coalesced_calls_total", "Lookups that shared an identical in-flight call.", ["source"]
+)
+
+
+def company_key(company_name):
+    from enrichment import normalize_company_key
+    return normalize_company_key(company_name)
+
+
+def domain_key(url_or_domain):
+    """'https://www.Acme.com/about' and 'acme.com' both map to 'acme.com'."""
+    value = url_or_domain.strip().lower()
+    host = urlparse(value if "://" in value else f"//{value}").hostname or ""
+    return host.rstrip(".").removeprefix("www.")
+
+
+class SingleFlight:
+    """Tracks the calls in flight, per key, for sync and async callers."""
+
+    def __init__(self):
+        # key -> (future, lane)
+        self._calls = {}
+        self._lock = threading.Lock()
+        # (event loop, key) -> (task, lane); only touched from the loop's own thread
+        self._tasks = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = (Future(), SharedLane(shared_lane.get()))
+        future, lane = call
+        if not leader:
+            coalesced_calls.inc(key[0])
+            if is_interactive():
+                lane.promoted = True
+            # Callers may modify what they get back
+            return copy.deepcopy(future.result())
+
+        token = shared_lane.set(lane)
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            shared_lane.reset(token)
+            with self._lock:
+                del self._calls[key]
+
+    async def do_async(self, key, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        call = self._tasks.get((loop, key))
+        if call is not None:
+            task, lane = call
+            coalesced_calls.inc(key[0])
+            if is_interactive():
+                lane.promoted = True
+            return copy.deepcopy(await asyncio.shield(task))
+
+        lane = SharedLane(shared_lane.get())
+        # The task runs in a copy of the current context, taken here
+        token = shared_lane.set(lane)
+        try:
+            task = loop.create_task(fn(*args, **kwargs))
+        finally:
+            shared_lane.reset(token)
+        self._tasks[(loop, key)] = (task, lane)
+        task.add_done_callback(lambda _: self._tasks.pop((loop, key), None))
+        # A cancelled caller doesn't cancel the call the others are waiting on
+        return await asyncio.shield(task)
+
+
+_flights = SingleFlight()
+
+
+def single_flight(source, key):
+    """Coalesce concurrent calls of a sync or async lookup.
+
+    Calls share a flight when ``key`` maps their first argument to the same
+    value and their other arguments are equal. Calls whose key is empty
+    always run on their own.
+    """
+    def flight_key(args, kwargs):
+        normalized = key(args[0]) if args and isinstance(args[0], str) else None
+        if not normalized:
+            return None
+        return source, normalized, args[1:], tuple(sorted(kwargs.items()))
+
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                flight = flight_key(args, kwargs)
+                if flight is None:
+                    return await fn(*args, **kwargs)
+                return await _flights.do_async(flight, fn, *args, **kwargs)
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            flight = flight_key(args, kwargs)
+            if flight is None:
+                return fn(*args, **kwargs)
+            return _flights.do(flight, fn, *args, **kwargs)
+        return wrapper
+    return decorator
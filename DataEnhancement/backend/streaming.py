@@ -0,0 +1,40 @@
+from flask import request, Response
+from responses import dumps
+
+STREAM_MIMETYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+
+def requested_stream_format():
+    """Return 'ndjson' or 'sse' if the client asked for a streamed response, else None."""
+    stream_format = request.args.get("stream", "").lower()
+    if stream_format in STREAM_MIMETYPES:
+        return stream_format
+
+    accept = request.headers.get("Accept", "")
+    for stream_format, mimetype in STREAM_MIMETYPES.items():
+        if mimetype in accept:
+            return stream_format
+    return None
+
+
+def encode_event(event, data, stream_format):
+    """Serialize one event as NDJSON line or SSE frame bytes."""
+    if stream_format == "sse":
+        return b"event: " + event.encode("utf-8") + b"\ndata: " + dumps(data) + b"\n\n"
+    return dumps({"event": event, "data": data}) + b"\n"
+
+
+def stream_response(events, stream_format):
+    """Wrap an iterable of (event, data) pairs in a streamed Flask response."""
+    def generate():
+        for event, data in events:
+            yield encode_event(event, data, stream_format)
+
+    response = Response(generate(), mimetype=STREAM_MIMETYPES[stream_format])
+    # Stop proxies from buffering the stream
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
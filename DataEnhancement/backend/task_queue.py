@@ -0,0 +1,326 @@
+"""Durable task queue shared by the API and any number of worker processes.
+
+When TASK_QUEUE_DB is set, uploads and LinkedIn batch jobs stop scraping
+in-process: their company-level tasks are written to this SQLite file and
+``python worker.py`` processes lease, run and complete them. Single lookups
+and the /batch lookup endpoints still run on the API's own scheduler, which
+keeps their latency low.
+
+The file must be on a local disk that the API and all workers share, so they
+all run on one machine. The queue uses SQLite's WAL mode, which does not work
+on network filesystems.
+
+Delivery is at least once. A leased task belongs to its worker until the
+lease expires. Workers extend the leases of tasks they are still running; if
+a worker dies, its tasks are handed out again once the lease runs out, up to
+TASK_MAX_ATTEMPTS times.
+
+Leases follow the scheduler's order: interactive tasks first, then bulk
+tasks shared between users by their FAIR_SHARE_WEIGHTS. No user has more
+than USER_MAX_CONCURRENT bulk tasks leased at once.
+"""
+import os
+import json
+import time
+import socket
+import sqlite3
+import logging
+import threading
+from concurrent.futures import Future, wait
+from metrics import Gauge
+from scheduler import parse_weights, FAIR_SHARE_WEIGHTS, USER_MAX_CONCURRENT
+
+TASK_QUEUE_DB = os.getenv("TASK_QUEUE_DB")
+TASK_LEASE_SECONDS = float(os.getenv("TASK_LEASE_SECONDS", 300))
+TASK_MAX_ATTEMPTS = int(os.getenv("TASK_MAX_ATTEMPTS", 3))
+TASK_POLL_INTERVAL = float(os.getenv("TASK_POLL_INTERVAL", 0.5))
+# Tasks nobody collected (e.g. their API process died) are dropped after this long
+TASK_RETENTION = int(os.getenv("TASK_RETENTION", 24 * 3600))
+
+# Lower runs first
+PRIORITIES = {"interactive": 0, "bulk": 1}
+
+logger = logging.getLogger(__name__)
+
+
+class TaskFailedError(RuntimeError):
+    """Raised by a task's future when it failed on every attempt."""
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class TaskQueue:
+    """SQLite-backed queue of JSON tasks with leases."""
+
+    def __init__(self, path=TASK_QUEUE_DB, user_cap=USER_MAX_CONCURRENT, weights=None):
+        self.path = path
+        self.user_cap = user_cap
+        self._weights = parse_weights(FAIR_SHARE_WEIGHTS) if weights is None else weights
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        # Futures of tasks this process submitted and still waits for
+        self._futures = {}
+        self._futures_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._poller = None
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Autocommit; writes that must be atomic open their own transaction
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._create_schema(conn)
+        return conn
+
+    def _create_schema(self, conn):
+        with self._init_lock:
+            if self._initialized:
+                return
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    priority INTEGER NOT NULL,
+                    user TEXT,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    lease_owner TEXT,
+                    lease_expires REAL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL
+                )
+            """)
+            # Queue files created before tasks carried their user
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(tasks)")}
+            if "user" not in columns:
+                conn.execute("ALTER TABLE tasks ADD COLUMN user TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_ready ON tasks (status, kind, priority, id)")
+            self._initialized = True
+
+    # === Producer side ===
+
+    def put(self, kind, payload, priority="bulk", user=None):
+        """Queue a task for ``user``'s fair share and return its id."""
+        cursor = self._conn().execute(
+            "INSERT INTO tasks (kind, payload, priority, user, status, created_at) VALUES (?, ?, ?, ?, 'pending', ?)",
+            (kind, json.dumps(payload), PRIORITIES[priority], user, time.time())
+        )
+        return cursor.lastrowid
+
+    def submit(self, kind, payload, priority="bulk", user=None):
+        """Queue a task and return a Future for its result.
+
+        Cancelling the future takes the task off the queue if no worker has
+        leased it yet.
+        """
+        task_id = self.put(kind, payload, priority, user)
+        future = Future()
+        future.add_done_callback(lambda f: f.cancelled() and self.cancel(task_id))
+        with self._futures_lock:
+            self._futures[task_id] = future
+            if self._poller is None:
+                self._poller = threading.Thread(target=self._poll, name="task-queue-poller", daemon=True)
+                self._poller.start()
+        self._wakeup.set()
+        return future
+
+    def map(self, kind, payloads, priority="bulk", user=None, should_stop=None):
+        """Queue one task per payload and yield their futures in order.
+
+        Once ``should_stop()`` returns True, or the caller stops iterating,
+        the tasks that are still queued are withdrawn.
+        """
+        futures = [self.submit(kind, payload, priority, user) for payload in payloads]
+        try:
+            for future in futures:
+                while not wait([future], timeout=TASK_POLL_INTERVAL).done:
+                    if should_stop and should_stop():
+                        return
+                yield future
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def cancel(self, task_id):
+        self._conn().execute("DELETE FROM tasks WHERE id = ? AND status = 'pending'", (task_id,))
+        with self._futures_lock:
+            self._futures.pop(task_id, None)
+
+    def _poll(self):
+        """Resolve the futures of finished tasks and delete those tasks."""
+        while True:
+            with self._futures_lock:
+                task_ids = list(self._futures)
+            if not task_ids:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            try:
+                self._collect(task_ids)
+            except Exception as e:
+                logger.warning(f"Polling the task queue failed: {e}")
+            time.sleep(TASK_POLL_INTERVAL)
+
+    def _collect(self, task_ids):
+        conn = self._conn()
+        # Stay well below SQLite's limit on bound parameters
+        for start in range(0, len(task_ids), 500):
+            chunk = task_ids[start:start + 500]
+            rows = conn.execute(
+                f"SELECT id, status, result, error FROM tasks "
+                f"WHERE id IN ({', '.join('?' for _ in chunk)}) AND status IN ('done', 'failed')",
+                chunk
+            ).fetchall()
+            for row in rows:
+                with self._futures_lock:
+                    future = self._futures.pop(row["id"], None)
+                if future is not None and future.set_running_or_notify_cancel():
+                    if row["status"] == "done":
+                        future.set_result(json.loads(row["result"]))
+                    else:
+                        future.set_exception(TaskFailedError(row["error"]))
+            if rows:
+                conn.execute(
+                    f"DELETE FROM tasks WHERE id IN ({', '.join('?' for _ in rows)})",
+                    [row["id"] for row in rows]
+                )
+
+    # === Worker side ===
+
+    def lease(self, worker_id, kinds, limit=1, lease_seconds=TASK_LEASE_SECONDS):
+        """Claim up to ``limit`` ready tasks of ``kinds``: pending ones, or ones whose lease ran out.
+
+        Returns a list of {"id", "kind", "payload", "attempts"} dicts.
+        """
+        now = time.time()
+        kind_marks = ", ".join("?" for _ in kinds)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Tasks whose worker died on every attempt are given up on
+            conn.execute(
+                "UPDATE tasks SET status = 'failed', error = 'Lease expired on every attempt' "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, TASK_MAX_ATTEMPTS)
+            )
+            conn.execute("DELETE FROM tasks WHERE created_at < ?", (now - TASK_RETENTION,))
+            ready = f"kind IN ({kind_marks}) AND (status = 'pending' OR (status = 'leased' AND lease_expires < ?))"
+            rows = conn.execute(
+                f"SELECT id, kind, payload, attempts FROM tasks WHERE {ready} AND priority = ? ORDER BY id LIMIT ?",
+                (*kinds, now, PRIORITIES["interactive"], limit)
+            ).fetchall()
+            rows += self._next_bulk(conn, ready, (*kinds, now), now, limit - len(rows))
+            for row in rows:
+                conn.execute(
+                    "UPDATE tasks SET status = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1 "
+                    "WHERE id = ?",
+                    (worker_id, now + lease_seconds, row["id"])
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return [
+            {"id": row["id"], "kind": row["kind"], "payload": json.loads(row["payload"]),
+             "attempts": row["attempts"] + 1}
+            for row in rows
+        ]
+
+    def _next_bulk(self, conn, ready, params, now, limit):
+        """Pick up to ``limit`` ready bulk tasks, one at a time, for the user furthest below their share.
+
+        The stateless counterpart of the scheduler's deficit round-robin:
+        users with queued tasks are served in order of leased tasks per unit
+        of weight, so under contention their running tasks follow their
+        weights. Users at ``user_cap`` are skipped.
+        """
+        if limit <= 0:
+            return []
+        running = dict(conn.execute(
+            "SELECT user, COUNT(*) FROM tasks WHERE status = 'leased' AND lease_expires >= ? AND priority = ? "
+            "GROUP BY user",
+            (now, PRIORITIES["bulk"])
+        ).fetchall())
+        # user -> id of their oldest ready task
+        heads = dict(conn.execute(
+            f"SELECT user, MIN(id) FROM tasks WHERE {ready} AND priority = ? GROUP BY user",
+            (*params, PRIORITIES["bulk"])
+        ).fetchall())
+
+        rows = []
+        while heads and len(rows) < limit:
+            eligible = [user for user in heads if running.get(user, 0) < self.user_cap]
+            if not eligible:
+                break
+            user = min(eligible, key=lambda u: (running.get(u, 0) / self._weights.get(u, 1), heads[u]))
+            rows.append(conn.execute(
+                "SELECT id, kind, payload, attempts FROM tasks WHERE id = ?", (heads[user],)
+            ).fetchone())
+            running[user] = running.get(user, 0) + 1
+            following = conn.execute(
+                f"SELECT MIN(id) FROM tasks WHERE {ready} AND priority = ? AND user IS ? AND id > ?",
+                (*params, PRIORITIES["bulk"], user, heads[user])
+            ).fetchone()[0]
+            if following is None:
+                del heads[user]
+            else:
+                heads[user] = following
+        return rows
+
+    def extend(self, worker_id, task_ids, lease_seconds=TASK_LEASE_SECONDS):
+        """Push back the lease of tasks ``worker_id`` still holds."""
+        if not task_ids:
+            return
+        self._conn().execute(
+            f"UPDATE tasks SET lease_expires = ? WHERE status = 'leased' AND lease_owner = ? "
+            f"AND id IN ({', '.join('?' for _ in task_ids)})",
+            (time.time() + lease_seconds, worker_id, *task_ids)
+        )
+
+    def complete(self, worker_id, task_id, result):
+        """Store a task's result. Returns False if the lease was lost to another worker."""
+        cursor = self._conn().execute(
+            "UPDATE tasks SET status = 'done', result = ?, lease_owner = NULL "
+            "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+            (json.dumps(result, default=str), task_id, worker_id)
+        )
+        return cursor.rowcount == 1
+
+    def fail(self, worker_id, task_id, error):
+        """Give a task back for another attempt, or fail it after TASK_MAX_ATTEMPTS."""
+        self._conn().execute(
+            "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "error = ?, lease_owner = NULL, lease_expires = NULL "
+            "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+            (TASK_MAX_ATTEMPTS, str(error), task_id, worker_id)
+        )
+
+    def depth(self):
+        """Queued and leased tasks by kind and status."""
+        if not self.enabled:
+            return {}
+        rows = self._conn().execute(
+            "SELECT kind, status, COUNT(*) AS n FROM tasks WHERE status IN ('pending', 'leased') GROUP BY kind, status"
+        ).fetchall()
+        return {(row["kind"], row["status"]): row["n"] for row in rows}
+
+
+task_queue = TaskQueue()
+
+Gauge(
+    "leadgen_task_queue_tasks", "Tasks in the shared queue, by kind and status.", ["kind", "status"],
+    collect=task_queue.depth
+)
@@ -0,0 +1,156 @@
+"""Worker process for the shared task queue.
+
+Leases company-level tasks from TASK_QUEUE_DB, runs them and stores the
+results for the API process that queued them. Start as many as the box can
+take; they must run on the same machine as the API, since the queue file
+has to be on a local disk:
+
+    TASK_QUEUE_DB=output/tasks.db python worker.py --kinds enrich,linkedin --threads 4
+
+"enrich" tasks run the website, Growjo and Apollo lookups for one company.
+"linkedin" tasks are leased a browser batch at a time and scraped in one
+Chrome session.
+"""
+import os
+import signal
+import logging
+import argparse
+import threading
+from dotenv import load_dotenv
+
+# The queue settings are read from the environment at import time
+load_dotenv()
+
+from logging_config import configure_logging
+from task_queue import task_queue, default_worker_id, TASK_LEASE_SECONDS, TASK_POLL_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+def run_enrich(worker_id, tasks):
+    from enrichment import enrich_company
+    for task in tasks:
+        task_queue.complete(worker_id, task["id"], enrich_company(task["payload"]))
+
+
+def run_linkedin(worker_id, tasks):
+    import pandas as pd
+    from scraper.linkedinScraper.main import run_batches
+    completed = iter(tasks)
+
+    def on_result(result):
+        task_queue.complete(worker_id, next(completed)["id"], result)
+
+    run_batches(pd.DataFrame([task["payload"] for task in tasks]), client_id=worker_id, on_result=on_result)
+
+
+def linkedin_batch_size():
+    from scraper.linkedinScraper.main import BATCH_SIZE
+    return BATCH_SIZE
+
+
+# kind -> (handler, number of tasks to lease at once)
+HANDLERS = {
+    "enrich": (run_enrich, lambda: 1),
+    "linkedin": (run_linkedin, linkedin_batch_size),
+}
+
+
+class Worker:
+    """Runs ``threads`` loops that lease and run tasks until stopped."""
+
+    def __init__(self, worker_id, kinds, threads=1, lease_seconds=TASK_LEASE_SECONDS):
+        self.worker_id = worker_id
+        self.kinds = kinds
+        self.threads = threads
+        self.lease_seconds = lease_seconds
+        self._held = set()
+        self._held_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def stop(self):
+        """Finish the tasks in hand, then exit."""
+        logger.info(f"Worker {self.worker_id} stopping")
+        self._stop.set()
+
+    def run(self):
+        logger.info(f"Worker {self.worker_id} serving {', '.join(self.kinds)} with {self.threads} threads")
+        threading.Thread(target=self._heartbeat, name="lease-heartbeat", daemon=True).start()
+        loops = [
+            threading.Thread(target=self._loop, name=f"worker-{i}") for i in range(self.threads)
+        ]
+        for loop in loops:
+            loop.start()
+        for loop in loops:
+            loop.join()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            worked = False
+            for kind in self.kinds:
+                handler, batch_size = HANDLERS[kind]
+                try:
+                    tasks = task_queue.lease(self.worker_id, [kind], batch_size(), self.lease_seconds)
+                except Exception as e:
+                    logger.warning(f"Could not lease {kind} tasks: {e}")
+                    continue
+                if tasks:
+                    worked = True
+                    self._run(kind, handler, tasks)
+            if not worked:
+                self._stop.wait(TASK_POLL_INTERVAL)
+
+    def _run(self, kind, handler, tasks):
+        ids = {task["id"] for task in tasks}
+        with self._held_lock:
+            self._held |= ids
+        error = f"Not completed by worker {self.worker_id}"
+        try:
+            handler(self.worker_id, tasks)
+        except Exception as e:
+            error = str(e)
+            logger.error(f"{kind} tasks {sorted(ids)} failed: {e}")
+        finally:
+            with self._held_lock:
+                self._held -= ids
+            # Anything the handler didn't complete goes back for another attempt
+            for task_id in ids:
+                task_queue.fail(self.worker_id, task_id, error)
+
+    def _heartbeat(self):
+        """Extend the leases of running tasks well before they expire."""
+        while not self._stop.wait(self.lease_seconds / 3):
+            with self._held_lock:
+                held = list(self._held)
+            try:
+                task_queue.extend(self.worker_id, held, self.lease_seconds)
+            except Exception as e:
+                logger.warning(f"Could not extend leases: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run tasks from the shared task queue")
+    parser.add_argument("--kinds", default=",".join(HANDLERS), help=f"task kinds to run, from: {', '.join(HANDLERS)}")
+    parser.add_argument("--threads", type=int, default=int(os.getenv("WORKER_THREADS", 4)))
+    parser.add_argument("--id", default=default_worker_id(), help="worker id used for leases and logs")
+    args = parser.parse_args()
+
+    kinds = [kind.strip() for kind in args.kinds.split(",") if kind.strip()]
+    unknown = [kind for kind in kinds if kind not in HANDLERS]
+    if unknown:
+        parser.error(f"unknown task kinds: {', '.join(unknown)}")
+    if not task_queue.enabled:
+        parser.error("TASK_QUEUE_DB is not set")
+
+    # One log file per worker; processes must not share a rotating file
+    configure_logging(log_file=os.path.join("log", f"worker_{args.id}.log"))
+    worker = Worker(args.id, kinds, threads=args.threads)
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        worker.stop()
+
+
+if __name__ == "__main__":
+    main()
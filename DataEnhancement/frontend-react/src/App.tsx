@@ -16,6 +16,19 @@ interface ApiResponse {
   results?: any[];
 }
 
+interface JobStatus {
+  job_id: string;
+  status: 'queued' | 'running' | 'completed' | 'failed' | 'cancelled' | 'interrupted';
+  total: number;
+  done: number;
+  failed: number;
+  eta_seconds: number | null;
+  error?: string;
+  result?: ApiResponse;
+}
+
+const JOB_POLL_INTERVAL = 2000; // 2 seconds
+
 interface ApiError {
   message: string;
   error: string;
@@ -53,13 +66,23 @@ const App: React.FC = () => {
 
       // Configure axios instance
       const axiosInstance = axios.create({
-        timeout: 300000, // 5 minutes
+        timeout: 60000, // 1 minute per request; processing runs as a background job
         headers: {
           'Authorization': `Bearer ${token}`,
         },
         withCredentials: true
       });
-      
+
+      // The backend sends a new token shortly before the current one expires
+      axiosInstance.interceptors.response.use((res) => {
+        const refreshedToken = res.headers['x-refreshed-token'];
+        if (refreshedToken) {
+          localStorage.setItem('token', refreshedToken);
+          axiosInstance.defaults.headers['Authorization'] = `Bearer ${refreshedToken}`;
+        }
+        return res;
+      });
+
       console.log('Uploading file...');
 
       // Make the request
@@ -73,9 +96,29 @@ const App: React.FC = () => {
         }
       });
 
+      // The backend queues the file as a job; poll until it finishes
+      const statusUrl: string = response.data.status_url;
+      let job: JobStatus;
+      do {
+        await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL));
+        job = (await axiosInstance.get<JobStatus>(statusUrl)).data;
+        console.log(`Job ${job.job_id}: ${job.done + job.failed}/${job.total} rows, ETA ${job.eta_seconds ?? '?'}s`);
+      } while (job.status === 'queued' || job.status === 'running');
+
+      if (job.status === 'interrupted') {
+        // The server running the job stopped; the stored rows are kept and it can carry on from them
+        throw new Error(
+          `Processing was interrupted after ${job.done + job.failed} of ${job.total} rows. ` +
+          `Resume it with POST ${statusUrl}/resume.`
+        );
+      }
+      if (job.status === 'failed' || !job.result) {
+        throw new Error(job.error || 'Processing failed');
+      }
+
       toast({
         title: 'Success',
-        description: `${response.data.message}. Processed ${response.data.total_processed} companies.`,
+        description: `${job.result.message}. Processed ${job.result.total_processed} companies.`,
         status: 'success',
         duration: 5000,
         isClosable: true,
@@ -2,11 +2,15 @@ import streamlit as st
 from streamlit_cookies_controller import CookieController
 import pandas as pd
 import requests
+import time
 import jwt
 
 JWT_SECRET = "fallback_secret_change_me_in_production"
 JWT_ALGORITHM = "HS256"
 BACKEND_URL = "http://localhost:5000"
+# Times a slice is retried when the backend is busy (429/503), and the longest wait between tries
+BATCH_RETRIES = 3
+MAX_RETRY_AFTER = 30
 
 cookies = CookieController()
 token = cookies.get("auth_token")
@@ -37,6 +41,37 @@ def auth_headers():
         st.stop()
     return {"Authorization": f"Bearer {token}"}
 
+def retry_after(response):
+    """Seconds the backend asked us to wait before trying again."""
+    try:
+        return min(max(float(response.headers.get("Retry-After", 1)), 0), MAX_RETRY_AFTER)
+    except ValueError:
+        return 1
+
+def post_batch(path, companies, headers, batch_size=200):
+    """POST companies to a batch endpoint in slices and merge the keyed results.
+
+    Returns (results, companies whose slice still failed after retries).
+    """
+    results = {}
+    failed = []
+    for i in range(0, len(companies), batch_size):
+        batch = companies[i:i + batch_size]
+        for attempt in range(BATCH_RETRIES + 1):
+            response = requests.post(f"{BACKEND_URL}{path}", json={"companies": batch}, headers=headers)
+            if response.status_code not in (429, 503) or attempt == BATCH_RETRIES:
+                break
+            time.sleep(retry_after(response))
+        if response.ok:
+            results.update(response.json().get("results", {}))
+        else:
+            failed.extend(batch)
+    return results, failed
+
+def warn_failed(what, failed):
+    if failed:
+        st.warning(f"⚠️ Could not fetch {what} for {len(failed)} companies: {', '.join(map(str, failed))}")
+
 def normalize_name(name):
     return name.strip().lower().replace(" ", "").replace("-", "").replace(".", "") if name else ""
 
@@ -183,33 +218,24 @@ if uploaded_file:
                 )
                 apollo_data = apollo_response.json() if apollo_response.ok else []
                 
-                # Enhance with LinkedIn and Growjo
-                status_text.text("🔍 Fetching data from LinkedIn and Growjo...")
-                for idx, company in enumerate(companies):
-                    # Get company website
-                    website_response = requests.get(
-                        f"{BACKEND_URL}/api/find-website",
-                        params={"company": company},
-                        headers=headers
-                    )
-                    
-                    if website_response.ok:
-                        website_data = website_response.json()
-                        normalized_df.loc[normalized_df['Company'] == company, 'Website'] = website_data.get('website', '')
-                    
-                    # Get company revenue
-                    revenue_response = requests.get(
-                        f"{BACKEND_URL}/api/get-revenue",
-                        params={"company": company},
-                        headers=headers
-                    )
-                    
-                    if revenue_response.ok:
-                        revenue_data = revenue_response.json()
-                        normalized_df.loc[normalized_df['Company'] == company, 'Revenue'] = revenue_data.get('revenue', '')
-                    
-                    progress = (idx + 1) / len(companies)
-                    progress_bar.progress(progress)
+                # Enhance with websites and Growjo revenue, one batch request each
+                status_text.text("🔍 Fetching company websites...")
+                websites, failed = post_batch("/api/find-website/batch", companies, headers)
+                warn_failed("websites", failed)
+                progress_bar.progress(0.5)
+
+                status_text.text("🔍 Fetching revenue data from Growjo...")
+                revenues, failed = post_batch("/api/get-revenue/batch", companies, headers)
+                warn_failed("revenue", failed)
+                progress_bar.progress(1.0)
+
+                for company in companies:
+                    key = str(company).strip()
+                    mask = normalized_df['Company'] == company
+                    if key in websites:
+                        normalized_df.loc[mask, 'Website'] = websites[key].get('website', '')
+                    if key in revenues:
+                        normalized_df.loc[mask, 'Revenue'] = revenues[key].get('estimated_revenue', '')
                 
                 st.success("✅ Data enhancement complete!")
                 st.dataframe(normalized_df, use_container_width=True)